@@ -24,6 +24,10 @@ from .manaus.boto_proxy import BotoClientProxy
 from .manaus.utils import extract_client_error_code
 from .stack_references import check_file_exceptions
 
+# (region, security group name) -> security group id, components of the same
+# definition usually share the security groups
+SECURITY_GROUP_ID_CACHE = {}
+
 
 def resolve_referenced_resource(ref: dict, region: str):
     if "Stack" in ref and "LogicalId" in ref:
@@ -160,16 +164,62 @@ def resolve_security_group(security_group, region: str):
     elif security_group.startswith("sg-"):
         return security_group
     else:
-        security_group = get_security_group(region, security_group)
-        if not security_group:
-            raise SecurityGroupNotFound(security_group)
-        return security_group.id
+        cache_key = (region, security_group)
+        if cache_key not in SECURITY_GROUP_ID_CACHE:
+            group = get_security_group(region, security_group)
+            if not group:
+                raise SecurityGroupNotFound(security_group)
+            SECURITY_GROUP_ID_CACHE[cache_key] = group.id
+        return SECURITY_GROUP_ID_CACHE[cache_key]
+
+
+def prefetch_security_groups(sg_names: list, region: str):
+    """
+    Looks up several security groups by name with (at most) two EC2 calls
+    and stores their ids in ``SECURITY_GROUP_ID_CACHE``.
+
+    Like ``get_security_group`` the Name tag takes precedence over the group
+    name. Names that can't be found this way are left to
+    ``get_security_group``, which also handles the API errors.
+    """
+    ec2 = boto3.resource("ec2", region)
+    missing = list(sg_names)
+    try:
+        for filter_name in ("tag:Name", "group-name"):
+            if not missing:
+                break
+            found = {}
+            for security_group in ec2.security_groups.filter(
+                Filters=[{"Name": filter_name, "Values": missing}]
+            ):
+                if filter_name == "group-name":
+                    name = security_group.group_name
+                else:
+                    name = get_tag(security_group.tags, "Name")
+                found.setdefault(name, security_group.id)
+            for name in missing:
+                if name in found:
+                    SECURITY_GROUP_ID_CACHE[(region, name)] = found[name]
+            missing = [name for name in missing if name not in found]
+    except (BotoCoreError, ClientError):
+        # fall back to resolving the groups one by one
+        pass
 
 
 def resolve_security_groups(security_groups: list, region: str):
     """
     Resolves a list of security groups (see ``resolve_security_group``).
     """
+    unresolved_names = [
+        security_group
+        for security_group in security_groups
+        if isinstance(security_group, str)
+        and not security_group.startswith("sg-")
+        and (region, security_group) not in SECURITY_GROUP_ID_CACHE
+    ]
+    if len(unresolved_names) > 1:
+        prefetch_security_groups(unresolved_names, region)
+
     result = []
     for security_group in security_groups:
         result.append(resolve_security_group(security_group, region))
@@ -1816,7 +1816,7 @@ def patch(stack_ref, region, image, instance_type, user_data):
         ami = taupage.find_image(region, channel=taupage.CHANNELS[image])
         if ami is None:
             fatal_error("No Taupage AMI found for {}".format(image))
-        image = ami.id
+        image = ami['ImageId']
 
     properties = {
         "ImageId": image,
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 import click
 from clickclick import fatal_error
 from senza.aws import resolve_security_groups
@@ -26,9 +28,40 @@ SENZA_PROPERTIES = frozenset(
 ALLOWED_HEALTH_CHECK_PROTOCOLS = frozenset(["HTTP", "HTTPS", "TCP", "UDP", "SSL"])
 ALLOWED_LOADBALANCER_SCHEMES = frozenset(["internet-facing", "internal"])
 
+# domains which were already checked for CNAME records in this run
+CONVERTED_DOMAINS = set()
+# (region, subdomain, zone) -> certificate arn found by find_ssl_cert
+SSL_CERT_CACHE = {}
+
+
+def ensure_alias_records(domain_name: str):
+    """
+    Converts the CNAME records of the domain to Alias records, checking each
+    domain only once as this requires several Route53 API calls.
+    """
+    if domain_name not in CONVERTED_DOMAINS:
+        convert_cname_records_to_alias(domain_name)
+        CONVERTED_DOMAINS.add(domain_name)
+
+
+@lru_cache(maxsize=64)
+def _zone_to_iam_pattern(zone: str) -> str:
+    """
+    IAM server certificates are named after the zone with dashes instead of
+    dots (e.g. "example-org" for "example.org.")
+    """
+    return zone.lower().rstrip(".").replace(".", "-")
+
 
 def get_ssl_cert(subdomain, main_zone, ssl_cert, account_info: AccountArguments):
-    if ACMCertificate.arn_is_acm_certificate(ssl_cert):
+    if ssl_cert is None:
+        # the common case, no certificate was configured explicitly
+        if main_zone is not None:
+            cache_key = (account_info.Region, subdomain, main_zone)
+            if cache_key not in SSL_CERT_CACHE:
+                SSL_CERT_CACHE[cache_key] = find_ssl_cert(subdomain, main_zone, account_info)
+            ssl_cert = SSL_CERT_CACHE[cache_key]
+    elif ACMCertificate.arn_is_acm_certificate(ssl_cert):
         # check if certificate really exists
         try:
             ACMCertificate.get_by_arn(account_info.Region, ssl_cert)
@@ -38,44 +71,66 @@ def get_ssl_cert(subdomain, main_zone, ssl_cert, account_info: AccountArguments)
     elif IAMServerCertificate.arn_is_server_certificate(ssl_cert):
         # TODO check if certificate exists
         pass
-    elif ssl_cert is not None:
+    else:
         certificate = IAMServerCertificate.get_by_name(account_info.Region, ssl_cert)
         ssl_cert = certificate.arn
-    elif main_zone is not None:
+
+    return ssl_cert
+
+
+def find_ssl_cert(subdomain, main_zone, account_info: AccountArguments):
+    """
+    Finds the best SSL certificate for the zone, preferring ACM certificates
+    over IAM server certificates
+    """
+    iam = IAM(account_info.Region)
+    if main_zone:
+        iam_pattern = _zone_to_iam_pattern(main_zone)
+        name = "{sub}.{zone}".format(sub=subdomain, zone=main_zone.rstrip("."))
+        acm = ACM(account_info.Region)
+        # only the best certificate of each is needed, so use max/min
+        # instead of sorting the whole list
+        acm_certificate = max(acm.get_certificates(domain_name=name), default=None)
+        iam_certificate = min(iam.get_certificates(name=iam_pattern), default=None)
+    else:
+        acm_certificate = None
+        iam_certificate = min(iam.get_certificates(name=""), default=None)
+
+    # the priority is acm_certificate first and iam_certificate second
+    if acm_certificate is not None:
+        certificate = acm_certificate  # type: Union[ACMCertificate, IAMServerCertificate] # noqa: F821
+    elif iam_certificate is not None:
+        certificate = iam_certificate
+    else:
+        # if there are no iam certificates matching the pattern
+        # try to use any certificate
+        certificate = max(iam.get_certificates(), default=None)
+
+    if certificate is None:
         if main_zone:
-            iam_pattern = main_zone.lower().rstrip(".").replace(".", "-")
-            name = "{sub}.{zone}".format(sub=subdomain, zone=main_zone.rstrip("."))
-            acm = ACM(account_info.Region)
-            acm_certificates = sorted(
-                acm.get_certificates(domain_name=name), reverse=True
+            fatal_error(
+                "Could not find any matching "
+                'SSL certificate for "{}"'.format(name)
             )
         else:
-            iam_pattern = ""
-            acm_certificates = []
-        iam = IAM(account_info.Region)
-        iam_certificates = sorted(iam.get_certificates(name=iam_pattern))
-        if not iam_certificates:
-            # if there are no iam certificates matching the pattern
-            # try to use any certificate
-            iam_certificates = sorted(iam.get_certificates(), reverse=True)
-
-        # the priority is acm_certificate first and iam_certificate second
-        certificates = (
-            acm_certificates + iam_certificates
-        )  # type: List[Union[ACMCertificate, IAMServerCertificate]] # noqa: F821
-        try:
-            certificate = certificates[0]
-            ssl_cert = certificate.arn
-        except IndexError:
-            if main_zone:
-                fatal_error(
-                    "Could not find any matching "
-                    'SSL certificate for "{}"'.format(name)
-                )
-            else:
-                fatal_error("Could not find any SSL certificate")
+            fatal_error("Could not find any SSL certificate")
 
-    return ssl_cert
+    return certificate.arn
+
+
+def get_standard_tags(stack_name: str, stack_version: str):
+    """
+    Returns the default STUPS tags (Name, StackName and StackVersion) for the
+    load balancer resources.
+    """
+    return [
+        # Tag "Name"
+        {"Key": "Name", "Value": "{0}-{1}".format(stack_name, stack_version)},
+        # Tag "StackName"
+        {"Key": "StackName", "Value": stack_name},
+        # Tag "StackVersion"
+        {"Key": "StackVersion", "Value": stack_version},
+    ]
 
 
 def get_listeners(configuration):
@@ -119,7 +174,7 @@ def component_elastic_load_balancer(
 
         domain_name = "{0}.{1}".format(domain["Subdomain"], domain["Zone"])
 
-        convert_cname_records_to_alias(domain_name)
+        ensure_alias_records(domain_name)
 
         properties = {
             "Type": "A",
@@ -168,14 +223,13 @@ def component_elastic_load_balancer(
         health_check_protocol, health_check_port, health_check_path
     )
 
-    if configuration.get("NameSuffix"):
-        version = "{}-{}".format(info["StackVersion"], configuration["NameSuffix"])
-        loadbalancer_name = get_load_balancer_name(info["StackName"], version)
-        del (configuration["NameSuffix"])
+    # NameSuffix is not a CF property, so remove it before the overrides
+    name_suffix = configuration.pop("NameSuffix", None)
+    if name_suffix:
+        version = "{}-{}".format(info["StackVersion"], name_suffix)
     else:
-        loadbalancer_name = get_load_balancer_name(
-            info["StackName"], info["StackVersion"]
-        )
+        version = info["StackVersion"]
+    loadbalancer_name = get_load_balancer_name(info["StackName"], version)
 
     loadbalancer_scheme = configuration.get("Scheme") or "internal"
 
@@ -224,17 +278,7 @@ def component_elastic_load_balancer(
             "SecurityGroups": resolve_security_groups(
                 configuration["SecurityGroups"], args.region
             ),
-            "Tags": [
-                # Tag "Name"
-                {
-                    "Key": "Name",
-                    "Value": "{0}-{1}".format(info["StackName"], info["StackVersion"]),
-                },
-                # Tag "StackName"
-                {"Key": "StackName", "Value": info["StackName"]},
-                # Tag "StackVersion"
-                {"Key": "StackVersion", "Value": info["StackVersion"]},
-            ],
+            "Tags": get_standard_tags(info["StackName"], info["StackVersion"]),
         },
     }
     for key, val in configuration.items():
@@ -1,13 +1,14 @@
 import click
 from senza.aws import resolve_security_groups
 from senza.components.elastic_load_balancer import (ALLOWED_LOADBALANCER_SCHEMES,
+                                                    ensure_alias_records,
                                                     get_load_balancer_name,
-                                                    get_ssl_cert)
+                                                    get_ssl_cert,
+                                                    get_standard_tags)
 from senza.utils import generate_valid_cloud_name
 from senza.definitions import AccountArguments
 
 from ..cli import TemplateArguments
-from ..manaus.route53 import convert_cname_records_to_alias
 
 SENZA_PROPERTIES = frozenset(['Domains', 'HealthCheckPath', 'HealthCheckPort', 'HealthCheckProtocol',
                               'HTTPPort', 'Name', 'SecurityGroups', 'SSLCertificateId', 'Type'])
@@ -44,54 +45,62 @@ def component_elastic_load_balancer_v2(definition,
                                        force,
                                        account_info: AccountArguments):
     lb_name = configuration["Name"]
+    stack_name = info["StackName"]
+    stack_version = info["StackVersion"]
+    resources = definition["Resources"]
     # domains pointing to the load balancer
     subdomain = ''
     main_zone = None
-    for name, domain in configuration.get('Domains', {}).items():
-        name = '{}{}'.format(lb_name, name)
-
-        domain_name = "{0}.{1}".format(domain["Subdomain"], domain["Zone"])
+    domains = configuration.get('Domains')
+    if domains:
+        # all records point to the same load balancer, the (read-only) alias target can be shared
+        alias_target = {"HostedZoneId": {"Fn::GetAtt": [lb_name, "CanonicalHostedZoneID"]},
+                        "DNSName": {"Fn::GetAtt": [lb_name, "DNSName"]}}
+        set_identifier = "{0}-{1}".format(stack_name, stack_version)
+        for name, domain in domains.items():
+            name = lb_name + name
+            domain_subdomain, domain_zone = domain["Subdomain"], domain["Zone"]
+
+            domain_name = domain_subdomain + "." + domain_zone
+
+            ensure_alias_records(domain_name)
+
+            properties = {"Type": "A",
+                          "Name": domain_name,
+                          "HostedZoneName": domain_zone,
+                          "AliasTarget": alias_target}
+            resources[name] = {"Type": "AWS::Route53::RecordSet",
+                               "Properties": properties}
+
+            if domain["Type"] == "weighted":
+                properties['Weight'] = 0
+                properties['SetIdentifier'] = set_identifier
+                subdomain = domain_subdomain
+                main_zone = domain_zone  # type: str
+
+    # validate the configuration before looking up any certificates
+    health_check_protocol = configuration.get('HealthCheckProtocol') or 'HTTP'
 
-        convert_cname_records_to_alias(domain_name)
+    if health_check_protocol not in ALLOWED_HEALTH_CHECK_PROTOCOLS:
+        raise click.UsageError('Protocol "{}" is not supported for LoadBalancer'.format(health_check_protocol))
 
-        properties = {"Type": "A",
-                      "Name": domain_name,
-                      "HostedZoneName": domain["Zone"],
-                      "AliasTarget": {"HostedZoneId": {"Fn::GetAtt": [lb_name,
-                                                                      "CanonicalHostedZoneID"]},
-                                      "DNSName": {"Fn::GetAtt": [lb_name, "DNSName"]}}}
-        definition["Resources"][name] = {"Type": "AWS::Route53::RecordSet",
-                                         "Properties": properties}
+    http_port = configuration["HTTPPort"]
+    health_check_path = configuration.get("HealthCheckPath") or '/health'
+    health_check_port = configuration.get("HealthCheckPort") or http_port
 
-        if domain["Type"] == "weighted":
-            definition["Resources"][name]["Properties"]['Weight'] = 0
-            definition["Resources"][name]["Properties"]['SetIdentifier'] = "{0}-{1}".format(info["StackName"],
-                                                                                            info["StackVersion"])
-            subdomain = domain['Subdomain']
-            main_zone = domain['Zone']  # type: str
+    # resolved once, before the certificate lookups, as it may need to query (or ask for) the VPC
+    vpc_id = configuration.get("VpcId") or account_info.VpcID
 
     target_group_name = lb_name + 'TargetGroup'
     listeners = configuration.get('Listeners') or get_listeners(
         lb_name, target_group_name, subdomain, main_zone, configuration, account_info)
 
-    health_check_protocol = configuration.get('HealthCheckProtocol') or 'HTTP'
-
-    if health_check_protocol not in ALLOWED_HEALTH_CHECK_PROTOCOLS:
-        raise click.UsageError('Protocol "{}" is not supported for LoadBalancer'.format(health_check_protocol))
-
-    health_check_path = configuration.get("HealthCheckPath") or '/health'
-    health_check_port = configuration.get("HealthCheckPort") or configuration["HTTPPort"]
-
+    name_suffix = configuration.pop('NameSuffix', None)
     if configuration.get('LoadBalancerName'):
         loadbalancer_name = generate_valid_cloud_name(configuration["LoadBalancerName"], 32)
-    elif configuration.get('NameSuffix'):
-        version = '{}-{}'.format(info["StackVersion"],
-                                 configuration['NameSuffix'])
-        loadbalancer_name = get_load_balancer_name(info["StackName"], version)
-        del (configuration['NameSuffix'])
     else:
-        loadbalancer_name = get_load_balancer_name(info["StackName"],
-                                                   info["StackVersion"])
+        version = '{}-{}'.format(stack_version, name_suffix) if name_suffix else stack_version
+        loadbalancer_name = get_load_balancer_name(stack_name, version)
 
     loadbalancer_scheme = configuration.get('Scheme') or 'internal'
     if loadbalancer_scheme == 'internet-facing':
@@ -107,28 +116,12 @@ def component_elastic_load_balancer_v2(definition,
     else:
         loadbalancer_subnet_map = "LoadBalancerSubnets"
 
-    vpc_id = configuration.get("VpcId") or account_info.VpcID
-
-    tags = [
-        # Tag "Name"
-        {
-            "Key": "Name",
-            "Value": "{0}-{1}".format(info["StackName"], info["StackVersion"])
-        },
-        # Tag "StackName"
-        {
-            "Key": "StackName",
-            "Value": info["StackName"],
-        },
-        # Tag "StackVersion"
-        {
-            "Key": "StackVersion",
-            "Value": info["StackVersion"]
-        }
-    ]
+    # the load balancer and the target group intentionally share the same tags list,
+    # the overrides below only ever replace top-level properties and never modify it
+    tags = get_standard_tags(stack_name, stack_version)
 
     # load balancer
-    definition["Resources"][lb_name] = {
+    resources[lb_name] = {
         "Type": "AWS::ElasticLoadBalancingV2::LoadBalancer",
         "Properties": {
             'Name': loadbalancer_name,
@@ -144,7 +137,7 @@ def component_elastic_load_balancer_v2(definition,
             "Tags": tags
         }
     }
-    definition["Resources"][target_group_name] = {
+    resources[target_group_name] = {
         'Type': 'AWS::ElasticLoadBalancingV2::TargetGroup',
         'Properties': {
             'Name': loadbalancer_name,
@@ -154,7 +147,7 @@ def component_elastic_load_balancer_v2(definition,
             'HealthCheckProtocol': health_check_protocol,
             'HealthCheckTimeoutSeconds': '5',
             'HealthyThresholdCount': '2',
-            'Port': configuration['HTTPPort'],
+            'Port': http_port,
             'Protocol': 'HTTP',
             'UnhealthyThresholdCount': '2',
             'VpcId': vpc_id,
@@ -162,18 +155,17 @@ def component_elastic_load_balancer_v2(definition,
             'TargetGroupAttributes': [{'Key': 'deregistration_delay.timeout_seconds', 'Value': '60'}]
         }
     }
-    resource_names = set([lb_name, target_group_name])
-    for i, listener in enumerate(listeners):
-        if i == 0:
-            suffix = ''
-        else:
-            suffix = str(i + 1)
-        resource_name = lb_name + 'Listener' + suffix
-        definition['Resources'][resource_name] = listener
-        resource_names.add(resource_name)
-    for key, val in configuration.items():
-        # overwrite any specified properties, but only properties which were defined by us already
+    # listeners are named <lb_name>Listener, <lb_name>Listener2, ... (there is always at least one)
+    listener_name = lb_name + 'Listener'
+    listener_names = [listener_name] + ['{}{}'.format(listener_name, i) for i in range(2, len(listeners) + 1)]
+    resources.update(zip(listener_names, listeners))
+    resource_names = {lb_name, target_group_name}
+    resource_names.update(listener_names)
+    # overwrite any specified properties, but only properties which were defined by us already
+    override_keys = configuration.keys() - SENZA_PROPERTIES
+    if override_keys:
         for res in resource_names:
-            if key in definition['Resources'][res]['Properties'] and key not in SENZA_PROPERTIES:
-                definition['Resources'][res]['Properties'][key] = val
+            properties = resources[res]['Properties']
+            for key in properties.keys() & override_keys:
+                properties[key] = configuration[key]
     return definition
@@ -3,16 +3,19 @@ Functions to create Spotinst Elastigroups
 """
 
 import sys
+from functools import lru_cache
 
 import click
-import pierone
+import pierone.types
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 import senza
 from senza.aws import resolve_security_groups
 from senza.components.auto_scaling_group import normalize_network_threshold
 from senza.components.taupage_auto_scaling_group import check_application_id, check_application_version, \
-    check_docker_image_exists, generate_user_data
+    ensure_docker_image_exists, generate_user_data
 from senza.utils import ensure_keys
 from senza.spotinst import MissingSpotinstAccount
 
@@ -26,6 +29,23 @@ ELASTIGROUP_DEFAULT_STRATEGY = {
     "fallbackToOd": True,
 }
 ELASTIGROUP_DEFAULT_PRODUCT = "Linux/UNIX"
+IAM_ARN_PREFIX = "arn:aws:iam::"
+# Tag keys are case-sensitive: https://docs.aws.amazon.com/AWSEC2/latest/UserGuide/Using_Tags.html
+STANDARD_TAGS = frozenset(["Name", "StackName", "StackVersion"])
+SCALING_METRICS = {"CPU": "CPUUtilization", "NetworkIn": "NetworkIn", "NetworkOut": "NetworkOut"}
+SCALING_METRICS_LOWER = frozenset(metric.lower() for metric in SCALING_METRICS)
+SCALING_OPERATORS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+SPOTINST_CONNECT_TIMEOUT = 3
+SPOTINST_READ_TIMEOUT = 10
+
+# shared session, so that all Spotinst API calls reuse the same connection
+# and transient errors (throttling, 5xx) are retried with an exponential backoff
+SPOTINST_RETRY = Retry(total=5, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504), raise_on_status=False)
+SPOTINST_SESSION = requests.Session()
+SPOTINST_SESSION.mount(SPOTINST_API_URL, HTTPAdapter(max_retries=SPOTINST_RETRY))
+# (access token, AWS account id) -> Spotinst account id
+SPOTINST_ACCOUNT_ID_CACHE = {}
 
 
 def component_elastigroup(definition, configuration, args, info, force, account_info):
@@ -43,8 +63,8 @@ def component_elastigroup(definition, configuration, args, info, force, account_
 
     # launch configuration
     elastigroup_config = configuration["Elastigroup"]
-    ensure_keys(elastigroup_config, "scheduling")
-    ensure_keys(elastigroup_config, "thirdPartiesIntegration")
+    elastigroup_config.setdefault("scheduling", {})
+    elastigroup_config.setdefault("thirdPartiesIntegration", {})
 
     fill_standard_tags(definition, elastigroup_config)
     ensure_default_strategy(elastigroup_config)
@@ -87,8 +107,7 @@ def extract_block_mappings(configuration, elastigroup_config):
     """
     if "BlockDeviceMappings" not in configuration:
         return
-    elastigroup_config = ensure_keys(elastigroup_config, "compute", "launchSpecification")
-    launch_spec = elastigroup_config["compute"]["launchSpecification"]
+    launch_spec = elastigroup_config.setdefault("compute", {}).setdefault("launchSpecification", {})
     if "blockDeviceMappings" in launch_spec:
         return
     block_device_mappings = configuration.pop("BlockDeviceMappings")
@@ -155,9 +174,7 @@ def create_scale_rule(auto_scaling, operator, threshold, adjustment, cooldown):
     :return: an object valid for Spotinst's scaling rules
     """
     metric_type = auto_scaling.get("MetricType", "CPU")
-    valid_metrics = {"CPU": "CPUUtilization", "NetworkIn": "NetworkIn", "NetworkOut": "NetworkOut"}
-    ops = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
-    if metric_type.lower() not in map(lambda t: t.lower(), valid_metrics.keys()):
+    if metric_type.lower() not in SCALING_METRICS_LOWER:
         raise click.UsageError('Auto scaling MetricType "{}" not supported.'.format(metric_type))
     threshold, unit = normalize_threshold(metric_type, threshold)
     period = int(auto_scaling.get("Period", 300))
@@ -168,13 +185,13 @@ def create_scale_rule(auto_scaling, operator, threshold, adjustment, cooldown):
     return {
         "policyName": "Scale if {} {} {} {} for {} minutes ({})".format(
             metric_type,
-            ops.get(operator, "kind of"),
+            SCALING_OPERATORS.get(operator, "kind of"),
             threshold,
             unit,
             (period / 60) * evaluation_periods,
             statistic
         ),
-        "metricName": valid_metrics[metric_type],
+        "metricName": SCALING_METRICS[metric_type],
         "statistic": statistic,
         "unit": unit,
         "threshold": threshold,
@@ -196,10 +213,10 @@ def ensure_instance_monitoring(elastigroup_config):
     This functions will set the monitoring property to True if not set already in the compute.launchSpecification
     section. This enables EC2 enhanced monitoring, which is also the general STUPS behavior
     """
-    elastigroup_config = ensure_keys(elastigroup_config, "compute", "launchSpecification")
-    if "monitoring" in elastigroup_config["compute"]["launchSpecification"]:
+    launch_spec = elastigroup_config.setdefault("compute", {}).setdefault("launchSpecification", {})
+    if "monitoring" in launch_spec:
         return
-    elastigroup_config["compute"]["launchSpecification"]["monitoring"] = True
+    launch_spec["monitoring"] = True
 
 
 def ensure_default_strategy(elastigroup_config):
@@ -237,10 +254,7 @@ def ensure_default_product(elastigroup_config):
     This function ensures that the compute.product attribute for the Elastigroup is defined with a default value.
     See ELASTIGROUP_DEFAULT_PRODUCT
     """
-    elastigroup_config = ensure_keys(elastigroup_config, "compute")
-    if "product" in elastigroup_config["compute"]:
-        return
-    elastigroup_config["compute"]["product"] = ELASTIGROUP_DEFAULT_PRODUCT
+    elastigroup_config.setdefault("compute", {}).setdefault("product", ELASTIGROUP_DEFAULT_PRODUCT)
 
 
 def fill_standard_tags(definition, elastigroup_config):
@@ -249,19 +263,13 @@ def fill_standard_tags(definition, elastigroup_config):
     Elastigroup name attribute to the same value as the EC2 Name tag if found empty.
     The default STUPS EC2 Tags are Name, StackName and StackVersion
     """
-    # Tag keys are case-sensitive: https://docs.aws.amazon.com/AWSEC2/latest/UserGuide/Using_Tags.html
-    standard_tags = {"Name", "StackName", "StackVersion"}
-    elastigroup_config = ensure_keys(elastigroup_config, "compute", "launchSpecification")
+    launch_spec = elastigroup_config.setdefault("compute", {}).setdefault("launchSpecification", {})
     name = definition["Mappings"]["Senza"]["Info"]["StackName"]
     version = definition["Mappings"]["Senza"]["Info"]["StackVersion"]
     full_name = "{}-{}".format(name, version)
 
-    tags = []
-    if "tags" in elastigroup_config["compute"]["launchSpecification"]:
-        tags = elastigroup_config["compute"]["launchSpecification"]["tags"]
-
     # Remove any standard tags specified in ElastiGroup configuration
-    tags = list(filter(lambda tag: tag["tagKey"] not in standard_tags, tags))
+    tags = [tag for tag in launch_spec.get("tags", []) if tag["tagKey"] not in STANDARD_TAGS]
 
     # Add standard tags from Senza definition
     tags.extend([
@@ -269,8 +277,7 @@ def fill_standard_tags(definition, elastigroup_config):
         {"tagKey": "StackName", "tagValue": name},
         {"tagKey": "StackVersion", "tagValue": version}
     ])
-
-    elastigroup_config["compute"]["launchSpecification"]["tags"] = tags
+    launch_spec["tags"] = tags
 
     if elastigroup_config.get("name", "") == "":
         elastigroup_config["name"] = full_name
@@ -281,12 +288,12 @@ def extract_subnets(configuration, elastigroup_config, account_info):
     This fills in the subnetIds and region attributes of the Spotinst elastigroup, in case they're not defined already
     The subnetIds are discovered by Senza::StupsAutoConfiguration and the region is provided by the AccountInfo object
     """
-    elastigroup_config = ensure_keys(elastigroup_config, "compute")
-    subnet_ids = elastigroup_config["compute"].get("subnetIds", [])
+    compute_config = elastigroup_config.setdefault("compute", {})
+    subnet_ids = compute_config.get("subnetIds", [])
     target_region = elastigroup_config.get("region", account_info.Region)
     if not subnet_ids:
         subnet_set = "LoadBalancerSubnets" if configuration.get("AssociatePublicIpAddress", False) else "ServerSubnets"
-        elastigroup_config["compute"]["subnetIds"] = {"Fn::FindInMap": [subnet_set, {"Ref": "AWS::Region"}, "Subnets"]}
+        compute_config["subnetIds"] = {"Fn::FindInMap": [subnet_set, {"Ref": "AWS::Region"}, "Subnets"]}
     elastigroup_config["region"] = target_region
 
 
@@ -297,7 +304,7 @@ def extract_user_data(configuration, elastigroup_config, info: dict, force, acco
     See https://api.spotinst.com/elastigroup/amazon-web-services/create/#compute.launchSpecification.userData
     Any existing TaupageConfig will _always_ overwrite the userData for the Elastigroup
     """
-    elastigroup_config = ensure_keys(elastigroup_config, "compute", "launchSpecification")
+    launch_spec = elastigroup_config.setdefault("compute", {}).setdefault("launchSpecification", {})
     taupage_config = configuration.get("TaupageConfig", None)
     if taupage_config:
         if 'notify_cfn' not in taupage_config:
@@ -321,13 +328,22 @@ def extract_user_data(configuration, elastigroup_config, info: dict, force, acco
         if not source:
             raise click.UsageError('The "source" property of TaupageConfig must be specified')
 
-        docker_image = pierone.api.DockerImage.parse(source)
+        docker_image = pierone.types.DockerImage.parse(source)
 
-        if not force and docker_image.registry:
-            check_docker_image_exists(docker_image)
+        ensure_docker_image_exists(source, docker_image, force)
 
-        elastigroup_config["compute"]["launchSpecification"]["userData"] = \
-            {"Fn::Base64": generate_user_data(taupage_config, account_info.Region)}
+        launch_spec["userData"] = {"Fn::Base64": generate_user_data(taupage_config, account_info.Region)}
+
+
+def _as_list(refs):
+    """
+    Normalizes a single reference or a list of references into a list
+    """
+    if isinstance(refs, str):
+        return [refs]
+    if isinstance(refs, list):
+        return refs
+    return []
 
 
 def extract_load_balancer_name(configuration, elastigroup_config: dict):
@@ -339,49 +355,33 @@ def extract_load_balancer_name(configuration, elastigroup_config: dict):
     defintions.
     """
 
-    elastigroup_config = ensure_keys(elastigroup_config, "compute", "launchSpecification")
-    launch_spec_config = elastigroup_config["compute"]["launchSpecification"]
+    launch_spec_config = elastigroup_config.setdefault("compute", {}).setdefault("launchSpecification", {})
     health_check_type = "EC2"
 
-    if "loadBalancersConfig" not in launch_spec_config.keys():
+    if "loadBalancersConfig" not in launch_spec_config:
         load_balancers = []
 
         if "ElasticLoadBalancer" in configuration:
-            load_balancer_refs = configuration.pop("ElasticLoadBalancer")
+            load_balancer_refs = _as_list(configuration.pop("ElasticLoadBalancer"))
             health_check_type = "ELB"
-            if isinstance(load_balancer_refs, str):
+            for load_balancer_ref in load_balancer_refs:
                 load_balancers.append({
-                    "name": {"Ref": load_balancer_refs},
+                    "name": {"Ref": load_balancer_ref},
                     "type": "CLASSIC"
                 })
-            elif isinstance(load_balancer_refs, list):
-                for load_balancer_ref in load_balancer_refs:
-                    load_balancers.append({
-                        "name": {"Ref": load_balancer_ref},
-                        "type": "CLASSIC"
-                    })
         if "ElasticLoadBalancerV2" in configuration:
             health_check_type = "TARGET_GROUP"
-            load_balancer_refs = configuration.pop("ElasticLoadBalancerV2")
+            load_balancer_refs = _as_list(configuration.pop("ElasticLoadBalancerV2"))
             custom_target_groups = configuration.pop("TargetGroupARNs", None)
             if custom_target_groups:
-                for custom_target_group in custom_target_groups:
-                    load_balancers.append({
-                        "arn": custom_target_group,
-                        "type": "TARGET_GROUP"
-                    })
+                target_groups = custom_target_groups
             else:
-                if isinstance(load_balancer_refs, str):
-                    load_balancers.append({
-                        "arn": {"Ref": load_balancer_refs + 'TargetGroup'},
-                        "type": "TARGET_GROUP"
-                    })
-                elif isinstance(load_balancer_refs, list):
-                    for load_balancer_ref in load_balancer_refs:
-                        load_balancers.append({
-                            "arn": {"Ref": load_balancer_ref + "TargetGroup"},
-                            "type": "TARGET_GROUP"
-                        })
+                target_groups = [{"Ref": load_balancer_ref + "TargetGroup"} for load_balancer_ref in load_balancer_refs]
+            for target_group in target_groups:
+                load_balancers.append({
+                    "arn": target_group,
+                    "type": "TARGET_GROUP"
+                })
 
         if len(load_balancers) > 0:
             launch_spec_config["loadBalancersConfig"] = {"loadBalancers": load_balancers}
@@ -400,10 +400,9 @@ def extract_public_ips(configuration, elastigroup_config):
     Senza AssociatePublicIpAddress is set to True.
     If there's already a compute.launchSpecification.networkInterfaces config it is left untouched
     """
-    elastigroup_config = ensure_keys(elastigroup_config, "compute", "launchSpecification")
+    launch_spec_config = elastigroup_config.setdefault("compute", {}).setdefault("launchSpecification", {})
     if configuration.pop("AssociatePublicIpAddress", False):
-        launch_spec_config = elastigroup_config["compute"]["launchSpecification"]
-        if "networkInterfaces" not in launch_spec_config.keys():
+        if "networkInterfaces" not in launch_spec_config:
             launch_spec_config["networkInterfaces"] = [
                 {
                     "deleteOnTermination": True,
@@ -418,10 +417,9 @@ def extract_image_id(configuration, elastigroup_config: dict):
     This function identifies whether a senza formatted AMI mapping is configured,
     if so it transforms it into a Spotinst Elastigroup AMI API configuration
     """
-    elastigroup_config = ensure_keys(elastigroup_config, "compute", "launchSpecification")
-    launch_spec_config = elastigroup_config["compute"]["launchSpecification"]
+    launch_spec_config = elastigroup_config.setdefault("compute", {}).setdefault("launchSpecification", {})
 
-    if "imageId" not in launch_spec_config.keys():
+    if "imageId" not in launch_spec_config:
         image_key = configuration.get("Image", "LatestTaupageImage")
         launch_spec_config["imageId"] = {"Fn::FindInMap": ["Images", {"Ref": "AWS::Region"}, image_key]}
 
@@ -432,19 +430,23 @@ def extract_security_group_ids(configuration, elastigroup_config: dict, args):
     if so it transforms it into a Spotinst Elastigroup EC2-sq (by id) API configuration
     If there's already a compute.launchSpecification.securityGroupIds config it's left unchanged
     """
-    elastigroup_config = ensure_keys(elastigroup_config, "compute", "launchSpecification")
-    launch_spec_config = elastigroup_config["compute"]["launchSpecification"]
+    launch_spec_config = elastigroup_config.setdefault("compute", {}).setdefault("launchSpecification", {})
 
     security_group_ids = []
-    if "securityGroupIds" not in launch_spec_config.keys():
-        if "SecurityGroups" in configuration.keys():
+    if "securityGroupIds" not in launch_spec_config:
+        if "SecurityGroups" in configuration:
             security_groups_ref = configuration.pop("SecurityGroups")
 
             if isinstance(security_groups_ref, str):
                 security_group_ids = resolve_security_groups([security_groups_ref], args.region)
 
             elif isinstance(security_groups_ref, list):
-                security_group_ids = resolve_security_groups(security_groups_ref, args.region)
+                # the same group may be referenced more than once, only resolve it once
+                unique_security_groups = []
+                for security_group in security_groups_ref:
+                    if security_group not in unique_security_groups:
+                        unique_security_groups.append(security_group)
+                security_group_ids = resolve_security_groups(unique_security_groups, args.region)
 
             if len(security_group_ids) > 0:
                 launch_spec_config["securityGroupIds"] = security_group_ids
@@ -456,8 +458,7 @@ def extract_instance_types(configuration, elastigroup_config):
     are no SpotAlternatives the Elastigroup will have the same ondemand type as spot alternative
     If there's already a compute.instanceTypes config it will be left untouched
     """
-    elastigroup_config = ensure_keys(elastigroup_config, "compute")
-    compute_config = elastigroup_config["compute"]
+    compute_config = elastigroup_config.setdefault("compute", {})
 
     if "InstanceType" not in configuration:
         raise click.UsageError("You need to specify the InstanceType attribute to be able to use Elastigroups")
@@ -484,8 +485,7 @@ def extract_instance_profile(args, definition, configuration, elastigroup_config
     precedence.
     The IamInstanceProfile can specify either the ARN or just the instance profile name. This function will accept both
     """
-    elastigroup_config = ensure_keys(elastigroup_config, "compute", "launchSpecification")
-    launch_spec = elastigroup_config["compute"]["launchSpecification"]
+    launch_spec = elastigroup_config.setdefault("compute", {}).setdefault("launchSpecification", {})
     if "iamRole" in launch_spec:
         return
     if "IamRoles" in configuration:
@@ -493,10 +493,11 @@ def extract_instance_profile(args, definition, configuration, elastigroup_config
         launch_spec["iamRole"] = {"name": {"Ref": logical_id}}
     elif "IamInstanceProfile" in configuration:
         logical_id = configuration["IamInstanceProfile"]
-        attribute = "arn" if logical_id.startswith("arn:aws:iam::") else "name"
+        attribute = "arn" if logical_id.startswith(IAM_ARN_PREFIX) else "name"
         launch_spec["iamRole"] = {attribute: logical_id}
 
 
+@lru_cache(maxsize=8)
 def create_service_token(region: str):
     """
     dynamically creates the AWS Lambda service token based on the region
@@ -518,7 +519,10 @@ def extract_spotinst_account_id(access_token: str, definition: dict, account_inf
     """
     template_account_id = definition["Mappings"]["Senza"]["Info"].get("SpotinstAccountId")
     if not template_account_id:
-        template_account_id = resolve_account_id(access_token, account_info.AccountID)
+        cache_key = (access_token, account_info.AccountID)
+        if cache_key not in SPOTINST_ACCOUNT_ID_CACHE:
+            SPOTINST_ACCOUNT_ID_CACHE[cache_key] = resolve_account_id(access_token, account_info.AccountID)
+        template_account_id = SPOTINST_ACCOUNT_ID_CACHE[cache_key]
     return template_account_id
 
 
@@ -535,8 +539,9 @@ def resolve_account_id(access_token, account_id):
         "Authorization": "Bearer {}".format(access_token),
         "Content-Type": "application/json"
     }
-    response = requests.get('{}/setup/account?awsAccountId={}'.format(SPOTINST_API_URL, account_id),
-                            headers=headers, timeout=5)
+    response = SPOTINST_SESSION.get('{}/setup/account?awsAccountId={}'.format(SPOTINST_API_URL, account_id),
+                                    headers=headers,
+                                    timeout=(SPOTINST_CONNECT_TIMEOUT, SPOTINST_READ_TIMEOUT))
     response.raise_for_status()
     data = response.json()
     accounts = data.get("response", {}).get("items", [])
@@ -1,17 +1,32 @@
 
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
 from senza.utils import ensure_keys
 
 
 def get_merged_policies(roles: list):
     iam = boto3.resource('iam')
-    policies = []
-    for rolename in roles:
-        role = iam.Role(rolename)
-        for policy in role.policies.all():
-            policies.append({'PolicyName': policy.policy_name,
-                             'PolicyDocument': policy.policy_document})
-    return policies
+    # only the identifiers of the role policies are used here, reading any
+    # other attribute would load the policy with a GetRolePolicy call
+    role_policies = [(rolename, policy.name) for rolename in roles for policy in iam.Role(rolename).policies.all()]
+    if not role_policies:
+        return []
+
+    # boto3 resources are not thread-safe, so fetch the documents
+    # concurrently through the (thread-safe) low-level client instead
+    client = iam.meta.client
+
+    def get_policy_document(role_policy):
+        rolename, policy_name = role_policy
+        return client.get_role_policy(RoleName=rolename, PolicyName=policy_name)['PolicyDocument']
+
+    # map keeps the order
+    with ThreadPoolExecutor(max_workers=min(8, len(role_policies))) as executor:
+        documents = executor.map(get_policy_document, role_policies)
+        return [{'PolicyName': policy_name,
+                 'PolicyDocument': document}
+                for (_, policy_name), document in zip(role_policies, documents)]
 
 
 def component_iam_role(definition, configuration, args, info, force, account_info):
@@ -1,3 +1,6 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
 import senza.stups.taupage as taupage
 
 from senza.components.subnet_auto_configuration import component_subnet_auto_configuration
@@ -5,15 +8,23 @@ from senza.utils import ensure_keys
 
 
 def component_stups_auto_configuration(definition, configuration, args, info, force, account_info):
-    for channel in taupage.CHANNELS.values():
-        most_recent_image = taupage.find_image(args.region, channel)
+    # boto3 resources are not thread-safe, so the resource is only used in this thread (for the subnet
+    # lookup) and the image lookups share its low-level client, which is thread-safe
+    ec2 = boto3.resource('ec2', args.region)
+    ec2_client = ec2.meta.client
+    channels = list(taupage.CHANNELS.values())
+    with ThreadPoolExecutor(max_workers=len(channels)) as executor:
+        images = list(executor.map(lambda channel: taupage.find_image(args.region, channel, ec2_client),
+                                   channels))
+
+    for channel, most_recent_image in zip(channels, images):
         if most_recent_image:
             configuration = ensure_keys(configuration, "Images", channel.image_mapping, args.region)
-            configuration["Images"][channel.image_mapping][args.region] = most_recent_image.id
+            configuration["Images"][channel.image_mapping][args.region] = most_recent_image['ImageId']
         elif channel == taupage.DEFAULT_CHANNEL:
             # Require at least one image from the stable channel
             raise Exception('No Taupage AMI found')
 
-    component_subnet_auto_configuration(definition, configuration, args, info, force, account_info)
+    component_subnet_auto_configuration(definition, configuration, args, info, force, account_info, ec2)
 
     return definition
@@ -5,8 +5,9 @@ from senza.utils import ensure_keys
 from senza.aws import get_tag
 
 
-def component_subnet_auto_configuration(definition, configuration, args, info, force, account_info):
-    ec2 = boto3.resource('ec2', args.region)
+def component_subnet_auto_configuration(definition, configuration, args, info, force, account_info, ec2=None):
+    if ec2 is None:
+        ec2 = boto3.resource('ec2', args.region)
 
     vpc_id = configuration.get('VpcId', account_info.VpcID)
     availability_zones = configuration.get('AvailabilityZones')
@@ -17,7 +18,8 @@ def component_subnet_auto_configuration(definition, configuration, args, info, f
     lb_internal_subnets = []
     all_subnets = []
     for subnet in ec2.subnets.filter(Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}]):
-        name = get_tag(subnet.tags, 'Name', '')
+        # subnet names are matched case-insensitively (e.g. "DMZ-1a")
+        name = get_tag(subnet.tags, 'Name', '').lower()
         if availability_zones and subnet.availability_zone not in availability_zones:
             # skip subnet as it's not in one of the given AZs
             continue
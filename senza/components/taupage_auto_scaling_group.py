@@ -1,42 +1,47 @@
 import boto3
-import json
+import io
 import re
-import sys
 import textwrap
+import uuid
 
 import click
-import pierone.api
-import pierone.cli
-import stups_cli.config
+import pierone.types
 import os
 import yaml
-import zign.api
 from senza.aws import resolve_referenced_resource
 from senza.components.auto_scaling_group import component_auto_scaling_group
 from senza.docker import docker_image_exists
 from senza.utils import ensure_keys
 from typing import Optional
 
-_AWS_FN_RE = re.compile(r"('[{]{2} (.*?) [}]{2}')", re.DOTALL)
+# use the libyaml based dumper when available
+YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+# never wrap long lines (libyaml only accepts C int widths)
+YAML_MAX_WIDTH = 2 ** 31 - 1
 
 # from kio OpenAPI yaml
-APPLICATION_ID_RE = re.compile(r"^[a-z][a-z0-9-]*[a-z0-9]$")
-APPLICATION_VERSION_RE = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?$")
+APPLICATION_ID_RE = re.compile(r"[a-z][a-z0-9-]*[a-z0-9]")
+APPLICATION_VERSION_RE = re.compile(r"[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?")
+
+# Pier One registry -> OAuth token
+PIERONE_TOKEN_CACHE = {}
+# Docker image sources which are already known to exist
+CHECKED_DOCKER_IMAGES = set()
 
 
 def check_application_id(app_id: str):
-    if not APPLICATION_ID_RE.match(app_id):
+    if not APPLICATION_ID_RE.fullmatch(app_id):
         raise click.UsageError('Application id must satisfy regular '
-                               'expression pattern "{}"'.format(APPLICATION_ID_RE.pattern))
+                               'expression pattern "^{}$"'.format(APPLICATION_ID_RE.pattern))
 
 
 def check_application_version(version: str):
-    if not APPLICATION_VERSION_RE.match(version):
+    if not APPLICATION_VERSION_RE.fullmatch(version):
         raise click.UsageError('Application version must satisfy regular '
-                               'expression pattern "{}"'.format(APPLICATION_VERSION_RE.pattern))
+                               'expression pattern "^{}$"'.format(APPLICATION_VERSION_RE.pattern))
 
 
-def get_token(docker_image: pierone.api.DockerImage) -> Optional[dict]:
+def get_token(docker_image: pierone.types.DockerImage) -> Optional[dict]:
     """
     Attempt to get existing token.
     If that fails, try to login to pierone and then get the token.
@@ -48,8 +53,18 @@ def get_token(docker_image: pierone.api.DockerImage) -> Optional[dict]:
              'scope': ...,
              'token_type':  ...}
     """
+    # imported here as they are only needed for Pier One images and slow to import
+    import pierone.api
+    import pierone.cli
+    import stups_cli.config
+    import zign.api
+
+    if docker_image.registry in PIERONE_TOKEN_CACHE:
+        return PIERONE_TOKEN_CACHE[docker_image.registry]
+
     token = zign.api.get_existing_token('pierone')
     if token:
+        PIERONE_TOKEN_CACHE[docker_image.registry] = token
         return token
 
     config = stups_cli.config.load_config('pierone')
@@ -60,10 +75,13 @@ def get_token(docker_image: pierone.api.DockerImage) -> Optional[dict]:
         url=url, realm=None, name='pierone',
         user=user, password=None, prompt=True
     )
-    return zign.api.get_existing_token('pierone')
+    token = zign.api.get_existing_token('pierone')
+    if token:
+        PIERONE_TOKEN_CACHE[docker_image.registry] = token
+    return token
 
 
-def check_docker_image_exists(docker_image: pierone.api.DockerImage):
+def check_docker_image_exists(docker_image: pierone.types.DockerImage):
     token = None
     if 'pierone' in docker_image.registry:
         token = get_token(docker_image)
@@ -75,6 +93,8 @@ def check_docker_image_exists(docker_image: pierone.api.DockerImage):
             '''.format(docker_image)).strip()
             raise click.UsageError(msg)
         else:
+            import pierone.api
+
             token = token['access_token']
             exists = pierone.api.image_exists(docker_image, token)
     else:
@@ -86,6 +106,16 @@ def check_docker_image_exists(docker_image: pierone.api.DockerImage):
     return True
 
 
+def ensure_docker_image_exists(source: str, docker_image: pierone.types.DockerImage, force: bool):
+    """
+    Checks that the docker image exists unless forced or it has no registry,
+    checking each source only once per run
+    """
+    if not force and docker_image.registry and source not in CHECKED_DOCKER_IMAGES:
+        check_docker_image_exists(docker_image)
+        CHECKED_DOCKER_IMAGES.add(source)
+
+
 def component_taupage_auto_scaling_group(definition, configuration, args, info, force, account_info):
     # inherit from the normal auto scaling group but discourage user info and replace with a Taupage config
     if 'Image' not in configuration:
@@ -115,10 +145,9 @@ def component_taupage_auto_scaling_group(definition, configuration, args, info,
     if not source:
         raise click.UsageError('The "source" property of TaupageConfig must be specified')
 
-    docker_image = pierone.api.DockerImage.parse(source)
+    docker_image = pierone.types.DockerImage.parse(source)
 
-    if not force and docker_image.registry:
-        check_docker_image_exists(docker_image)
+    ensure_docker_image_exists(source, docker_image, force)
 
     config_name = configuration["Name"] + "Config"
     ensure_keys(definition, "Resources", config_name, "Properties")
@@ -133,8 +162,9 @@ def component_taupage_auto_scaling_group(definition, configuration, args, info,
         # we need to extend taupage_config with the mapping subnet-id => net ip
         nat_gateways = {}
         ec2 = boto3.client('ec2', args.region)
-        for nat_gateway in ec2.describe_nat_gateways()['NatGateways']:
-            if nat_gateway['SubnetId'] in server_subnets:
+        paginator = ec2.get_paginator('describe_nat_gateways')
+        for page in paginator.paginate(Filter=[{'Name': 'subnet-id', 'Values': sorted(server_subnets)}]):
+            for nat_gateway in page['NatGateways']:
                 for address in nat_gateway['NatGatewayAddresses']:
                     nat_gateways[nat_gateway['SubnetId']] = address['PrivateIp']
                     break
@@ -163,11 +193,13 @@ def generate_user_data(taupage_config, region):
     :return:
     """
 
+    aws_fns = []
+    # placeholders for the AWS functions use a random token, so they can't clash with the user's values
+    token = 'aws-fn-{}'.format(uuid.uuid4().hex)
+    aws_fn_re = re.compile("'?{}-([0-9]+)'?".format(token))
+
     def is_aws_fn(name):
-        try:
-            return name == "Ref" or (isinstance(name, str) and name.startswith("Fn::"))
-        except Exception:
-            return False
+        return isinstance(name, str) and (name == "Ref" or name.startswith("Fn::"))
 
     def transform(node):
         """Transform AWS functions and refs into an string representation for later split and substitution"""
@@ -177,9 +209,10 @@ def generate_user_data(taupage_config, region):
             if 'Stack' in node and 'Output' in node:
                 return resolve_referenced_resource(node, region)
             if num_keys > 0:
-                key = next(iter(node.keys()))
+                key = next(iter(node))
                 if num_keys == 1 and is_aws_fn(key):
-                    return "".join(["{{ ", json.dumps(node), " }}"])
+                    aws_fns.append(node)
+                    return "{}-{}".format(token, len(aws_fns) - 1)
                 else:
                     return {key: transform(value) for key, value in node.items()}
             else:
@@ -194,15 +227,18 @@ def generate_user_data(taupage_config, region):
 
         parts = []
         last_pos = 0
-        for m in _AWS_FN_RE.finditer(text):
-            parts += [text[last_pos:m.start(1)], json.loads(m.group(2))]
-            last_pos = m.end(1)
+        for m in aws_fn_re.finditer(text):
+            parts += [text[last_pos:m.start()], aws_fns[int(m.group(1))]]
+            last_pos = m.end()
         parts += [text[last_pos:]]
         return parts
 
-    yaml_text = yaml.dump(transform(taupage_config), width=sys.maxsize, default_flow_style=False)
+    user_data = io.StringIO()
+    user_data.write("#taupage-ami-config\n")
+    yaml.dump(transform(taupage_config), user_data, Dumper=YAML_DUMPER, width=YAML_MAX_WIDTH,
+              default_flow_style=False)
 
-    parts = split("#taupage-ami-config\n" + yaml_text)
+    parts = split(user_data.getvalue())
 
     if len(parts) == 1:
         return parts[0]
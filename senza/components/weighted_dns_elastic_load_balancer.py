@@ -1,8 +1,18 @@
-from typing import Dict
+from typing import Dict, Tuple
 
 from senza.definitions import AccountArguments
 from senza.components.elastic_load_balancer import component_elastic_load_balancer
-from senza.manaus.route53 import Route53
+
+
+def find_subdomain_and_zone(account_info: AccountArguments, domain_name: str) -> Tuple[str, str]:
+    """
+    Returns the subdomain and the name of the first hosted zone the domain belongs to, falling back to the main
+    domain found by ``account_info.split_domain``
+    """
+    subdomain, fall_back_hz = account_info.split_domain(domain_name)
+    hosted_zones = account_info.get_hosted_zones(domain_name)
+    zone = hosted_zones[0].name if hosted_zones else fall_back_hz
+    return subdomain, zone
 
 
 def component_weighted_dns_elastic_load_balancer(definition,
@@ -14,26 +24,14 @@ def component_weighted_dns_elastic_load_balancer(definition,
                                                  lb_component=component_elastic_load_balancer):
     if 'Domains' not in configuration:
         if 'MainDomain' in configuration:
-            main_domain = configuration['MainDomain']
-            main_subdomain, fall_back_hz = account_info.split_domain(main_domain)
-            try:
-                hosted_zone = next(Route53.get_hosted_zones(domain_name=main_domain))
-                main_zone = hosted_zone.name
-            except StopIteration:
-                main_zone = fall_back_hz
+            main_subdomain, main_zone = find_subdomain_and_zone(account_info, configuration['MainDomain'])
             del configuration['MainDomain']
         else:
             main_zone = account_info.Domain
             main_subdomain = info['StackName']
 
         if 'VersionDomain' in configuration:
-            version_domain = configuration['VersionDomain']
-            version_subdomain, fall_back_hz = account_info.split_domain(version_domain)
-            try:
-                hosted_zone = next(Route53.get_hosted_zones(domain_name=version_domain))
-                version_zone = hosted_zone.name
-            except StopIteration:
-                version_zone = fall_back_hz
+            version_subdomain, version_zone = find_subdomain_and_zone(account_info, configuration['VersionDomain'])
             del configuration['VersionDomain']
         else:
             version_zone = account_info.Domain
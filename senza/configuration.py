@@ -5,8 +5,11 @@ Senza configuration consists of an hierarchical yaml file with
 sections > keys > values, which are represented in the form SECTION.KEY
 """
 
+import os
+import stat
 from collections.abc import MutableMapping
 from pathlib import Path
+from tempfile import mkstemp
 from typing import Dict, Tuple
 
 import yaml
@@ -16,6 +19,10 @@ from .exceptions import InvalidConfigKey
 
 CONFIGURATION_PATH = Path(get_app_dir('senza')) / "config.yaml"
 
+# use the libyaml based implementations when available
+YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
 
 class Configuration(MutableMapping):
 
@@ -26,6 +33,9 @@ class Configuration(MutableMapping):
 
     def __init__(self, path: Path):
         self.config_path = path
+        # parsed configuration and the modification time of the file it was read from
+        self._cache = None
+        self._cache_mtime = None
 
     def __iter__(self):
         yield from self.raw_dict
@@ -37,11 +47,16 @@ class Configuration(MutableMapping):
         section, sub_key = self.__split_key(key)
         return self.raw_dict[section][sub_key]
 
+    def __contains__(self, key) -> bool:
+        section, sub_key = self.__split_key(key)
+        cfg = self.raw_dict
+        return section in cfg and sub_key in cfg[section]
+
     def __setitem__(self, key: str, value):
         section, sub_key = self.__split_key(key)
         cfg = self.raw_dict
 
-        if section not in self.raw_dict:
+        if section not in cfg:
             cfg[section] = {}
         cfg[section][sub_key] = str(value)
         self.__save(cfg)
@@ -70,27 +85,55 @@ class Configuration(MutableMapping):
         Saves the configuration in the configuration path, creating the
         directory if necessary.
         """
+        # cfg may be the (already modified) cached dict, so drop the cache
+        # until the file was written successfully
+        self._cache_mtime = None
         try:
             self.config_path.parent.mkdir(parents=True)
         except FileExistsError:
             # this try...except can be replaced with exist_ok=True when
             # we drop python3.4 support
             pass
-        with self.config_path.open('w+') as config_file:
-            yaml.safe_dump(cfg, config_file,
-                           default_flow_style=False)
+        # write to a temporary file next to the real one (following
+        # symlinks) first, so that readers never see a partially written
+        # configuration
+        target = os.path.realpath(str(self.config_path))
+        tmp_fd, tmp_name = mkstemp(dir=os.path.dirname(target),
+                                   prefix='.config-', suffix='.yaml.tmp')
+        try:
+            with os.fdopen(tmp_fd, 'w') as config_file:
+                try:
+                    # the configuration can contain secrets, keep its mode
+                    os.chmod(tmp_name, stat.S_IMODE(os.stat(target).st_mode))
+                except FileNotFoundError:
+                    pass
+                yaml.dump(cfg, config_file, Dumper=YAML_DUMPER,
+                          default_flow_style=False)
+            os.replace(tmp_name, target)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+        self._cache = cfg
+        self._cache_mtime = self.config_path.stat().st_mtime_ns
 
     @property
     def raw_dict(self) -> Dict[str, Dict[str, str]]:
         """
         Returns a dict with the configuration data as stored in config.yaml
+
+        The file is only parsed again if it was modified since the last read.
         """
         try:
-            with self.config_path.open() as config_file:
-                cfg = yaml.safe_load(config_file)
+            mtime = self.config_path.stat().st_mtime_ns
+            if self._cache_mtime is None or mtime != self._cache_mtime:
+                with self.config_path.open() as config_file:
+                    self._cache = yaml.load(config_file, Loader=YAML_LOADER)
+                self._cache_mtime = mtime
         except FileNotFoundError:
-            cfg = {}
-        return cfg
+            self._cache = None
+            self._cache_mtime = None
+            return {}
+        return self._cache
 
 
 configuration = Configuration(CONFIGURATION_PATH)  # pylint: disable=locally-disabled, invalid-name
@@ -4,16 +4,19 @@ Functions and classes related to Senza Definition files
 
 # pylint: disable=locally-disabled, invalid-name
 
-from typing import Tuple
+from typing import List, Tuple
 import sys
 
 from clickclick import choice
 from senza.aws import get_account_alias, get_account_id
 from senza.manaus.ec2 import EC2
 from senza.manaus.exceptions import VPCError
-from senza.manaus.route53 import Route53
+from senza.manaus.route53 import Route53, Route53HostedZone, filter_hosted_zones
 from senza.templates._helper import get_mint_bucket_name
 
+# region -> id of the default VPC, shared by all AccountArguments
+DEFAULT_VPC_CACHE = {}
+
 
 class AccountArguments:
     """
@@ -24,6 +27,8 @@ class AccountArguments:
         self.__AccountAlias = None
         self.__AccountID = None
         self.__Domain = None
+        self.__DomainByName = {}
+        self.__HostedZones = None
         self.__MintBucket = None
         self.__TeamID = None
         self.__VpcID = None
@@ -61,7 +66,7 @@ class AccountArguments:
         domain_name it will be  used otherwise the user will be presented with
         a choice.
         """
-        domain_list = list(Route53.get_hosted_zones(domain_name))
+        domain_list = self.get_hosted_zones(domain_name)
         if len(domain_list) == 0:
             raise AttributeError('No Domain configured')
         elif len(domain_list) > 1:
@@ -73,14 +78,30 @@ class AccountArguments:
         self.__Domain = domain
         return domain
 
+    def get_hosted_zones(self, domain_name=None) -> List[Route53HostedZone]:
+        """
+        Returns the hosted zones matching domain_name (or all of them). The
+        hosted zones are only listed once per instance.
+        """
+        if self.__HostedZones is None:
+            self.__HostedZones = list(Route53.get_hosted_zones())
+        if domain_name is None:
+            return list(self.__HostedZones)
+        return list(filter_hosted_zones(self.__HostedZones, domain_name))
+
     def split_domain(self, domain_name) -> Tuple[str, str]:
         """
         Splits domain_name in sub_domain and main_domain based on the account
         domain.
         """
-        self.__setDomain(domain_name)
-        if domain_name.endswith('.{}'.format(self.Domain)):
-            return domain_name[:-len('.{}'.format(self.Domain))], self.Domain
+        if domain_name in self.__DomainByName:
+            self.__Domain = self.__DomainByName[domain_name]
+        else:
+            self.__DomainByName[domain_name] = self.__setDomain(domain_name)
+        domain = self.Domain
+        suffix = '.' + domain
+        if domain_name.endswith(suffix):
+            return domain_name[:-len(suffix)], domain
         else:
             # default behaviour for unknown domains
             return domain_name.split('.', 1)
@@ -101,10 +122,13 @@ class AccountArguments:
         one, otherwise it will provide the user a choice if running in an
         interactive terminal or raise an exception otherwise.
         """
+        if self.__VpcID is None and self.Region in DEFAULT_VPC_CACHE:
+            self.__VpcID = DEFAULT_VPC_CACHE[self.Region]
         if self.__VpcID is None:
             ec2 = EC2(self.Region)
             try:
                 vpc = ec2.get_default_vpc()
+                DEFAULT_VPC_CACHE[self.Region] = vpc.vpc_id
             except VPCError as error:
                 if sys.stdin.isatty() and error.number_of_vpcs:
                     # if running in interactive terminal and there are VPCs
@@ -125,5 +149,6 @@ class AccountArguments:
         Returns the mintbucket for the current account
         """
         if self.__MintBucket is None:
-            self.__MintBucket = get_mint_bucket_name(self.Region)
+            # reuse the account id and alias this instance already knows
+            self.__MintBucket = get_mint_bucket_name(self.Region, self.AccountID, self.AccountAlias)
         return self.__MintBucket
@@ -4,24 +4,38 @@ Functions to interact with docker
 
 import requests
 
+# shared session, so that checks against the same registry reuse the connection
+DOCKER_REGISTRY_SESSION = requests.Session()
+# registry -> scheme its API was last reachable with
+REGISTRY_SCHEMES = {}
+
 
 def docker_image_exists(docker_image: str) -> bool:
     """
     Check whether the docker image exists by calling the Docker registry REST API
     """
 
-    parts = docker_image.split('/')
-    registry = parts[0]
-    repo = '/'.join(parts[1:])
-    repo, tag = repo.split(':')
+    registry, _, repo = docker_image.partition('/')
+    name, sep, tag = repo.rpartition(':')
+    if sep:
+        repo = name
+    else:
+        tag = ''
+
+    schemes = ['https', 'http']
+    if registry in REGISTRY_SCHEMES:
+        # try the scheme that worked before first
+        schemes.remove(REGISTRY_SCHEMES[registry])
+        schemes.insert(0, REGISTRY_SCHEMES[registry])
 
-    for scheme in 'https', 'http':
+    for scheme in schemes:
         try:
             url = '{scheme}://{registry}/v2/{repo}/tags/list'.format(scheme=scheme,
                                                                      registry=registry,
                                                                      repo=repo)
-            response = requests.get(url, timeout=5)
+            response = DOCKER_REGISTRY_SESSION.get(url, timeout=5)
             result = response.json()
+            REGISTRY_SCHEMES[registry] = scheme
             return tag in result.get('tags', [])
         except requests.RequestException:
             pass
@@ -3,15 +3,15 @@ Functions to handle exceptions that bubble to the top, including Sentry
 integration
 """
 
+import os
 import sys
-from tempfile import NamedTemporaryFile
+from tempfile import mkstemp
 from traceback import format_exception
 from typing import Optional  # noqa: F401
 
 import yaml.constructor
 from botocore.exceptions import ClientError, NoCredentialsError
 from clickclick import fatal_error
-from raven import Client
 
 import senza
 from .configuration import configuration
@@ -28,45 +28,55 @@ def store_exception(exception: Exception) -> str:
     Stores the exception in a temporary file and returns its filename
     """
 
-    tracebacks = format_exception(etype=type(exception),
-                                  value=exception,
-                                  tb=exception.__traceback__)  # type: [str]
+    # arguments are passed positionally, the names changed in Python 3.10
+    tracebacks = format_exception(type(exception),
+                                  exception,
+                                  exception.__traceback__)  # type: [str]
+
+    # the traceback is written once, so skip the buffered file object
+    data = memoryview(''.join(tracebacks).encode())
+    error_fd, file_name = mkstemp(prefix="senza-traceback-")
+    try:
+        # os.write may write less than it was given
+        while data:
+            data = data[os.write(error_fd, data):]
+    finally:
+        os.close(error_fd)
 
-    content = ''.join(tracebacks)
+    return file_name
 
-    with NamedTemporaryFile(prefix="senza-traceback-",
-                            delete=False) as error_file:
-        file_name = error_file.name
-        error_file.write(content.encode())
 
-    return file_name
+def die_fatal_error(message):
+    """Sent error message to stderr, in red, and exit"""
+    fatal_error(message, err=True)
 
 
-def is_credentials_expired_error(client_error: ClientError) -> bool:
-    """Return true if the exception's error code is ExpiredToken or RequestExpired"""
-    return extract_client_error_code(client_error) in ['ExpiredToken',
-                                                       'RequestExpired']
+def die_credentials_expired(client_error: ClientError):
+    """Tell the user to get new credentials, and exit"""
+    die_fatal_error('AWS credentials have expired.\n'
+                    'Use the "zaws" command line tool to get a new '
+                    'temporary access key.')
 
 
-def is_access_denied_error(client_error: ClientError) -> bool:
-    """
-    Checks the ``ClientError`` details to find out if it is an
-    Access Denied Error
-    """
-    return extract_client_error_code(client_error) in ['AccessDenied']
+def die_access_denied(client_error: ClientError):
+    """Show which access rights are missing, and exit"""
+    die_fatal_error(
+        "AWS missing access rights.\n{}".format(
+            client_error.response['Error']['Message']))
 
 
-def is_validation_error(client_error: ClientError) -> bool:
-    """
-    Checks the ``ClientError`` details to find out if it is an
-    Validation Error
-    """
-    return extract_client_error_code(client_error) == 'ValidationError'
+def die_validation_error(client_error: ClientError):
+    """Show the validation error message, and exit"""
+    die_fatal_error(
+        "Validation Error: {}".format(
+            client_error.response['Error']['Message']))
 
 
-def die_fatal_error(message):
-    """Sent error message to stderr, in red, and exit"""
-    fatal_error(message, err=True)
+# known ``ClientError`` codes and how to report them to the user
+CLIENT_ERROR_HANDLERS = {'ExpiredToken': die_credentials_expired,
+                         'RequestExpired': die_credentials_expired,
+                         'AccessDenied': die_access_denied,
+                         'ValidationError': die_validation_error}
 
 
 class HandleExceptions:
@@ -114,18 +124,10 @@ class HandleExceptions:
                 'or AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY.')
         except ClientError as client_error:
             sys.stdout.flush()
-            if is_credentials_expired_error(client_error):
-                die_fatal_error('AWS credentials have expired.\n'
-                                'Use the "zaws" command line tool to get a new '
-                                'temporary access key.')
-            elif is_access_denied_error(client_error):
-                die_fatal_error(
-                    "AWS missing access rights.\n{}".format(
-                        client_error.response['Error']['Message']))
-            elif is_validation_error(client_error):
-                die_fatal_error(
-                    "Validation Error: {}".format(
-                        client_error.response['Error']['Message']))
+            handler = CLIENT_ERROR_HANDLERS.get(
+                extract_client_error_code(client_error))
+            if handler is not None:
+                handler(client_error)
             else:
                 self.die_unknown_error(client_error)
         except yaml.constructor.ConstructorError as yaml_error:
@@ -156,6 +158,8 @@ def setup_sentry(sentry_endpoint: Optional[str]):
     easier to test
     """
     if sentry_endpoint is not None:
+        # raven is slow to import and only needed when sentry is configured
+        from raven import Client
         sentry_client = Client(sentry_endpoint,
                                release=senza.__version__)
     else:
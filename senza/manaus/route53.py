@@ -331,6 +331,16 @@ class Route53Record:
             )
 
 
+def filter_hosted_zones(
+    hosted_zones: Iterable[Route53HostedZone], domain_name: str
+) -> Iterator[Route53HostedZone]:
+    """
+    Yields the hosted zones ``domain_name`` belongs to
+    """
+    domain_name = "{}.".format(domain_name.rstrip("."))
+    return (zone for zone in hosted_zones if domain_name.endswith(zone.name))
+
+
 class Route53:
     def __init__(self):
         self.client = BotoClientProxy("route53")
@@ -344,9 +354,6 @@ class Route53:
         only hosted zones that match the domain name will be yielded
         """
 
-        if domain_name is not None:
-            domain_name = "{}.".format(domain_name.rstrip("."))
-
         client = BotoClientProxy("route53")
         result = client.list_hosted_zones()
         hosted_zones = result["HostedZones"]
@@ -355,12 +362,11 @@ class Route53:
             result = client.list_hosted_zones(**recordfilter)
             hosted_zones.extend(result["HostedZones"])
 
-        for zone in hosted_zones:
-            hosted_zone = Route53HostedZone.from_boto_dict(zone)
-
-            if domain_name and not domain_name.endswith(hosted_zone.name):
-                continue
+        zones = (Route53HostedZone.from_boto_dict(zone) for zone in hosted_zones)
+        if domain_name is not None:
+            zones = filter_hosted_zones(zones, domain_name)
 
+        for hosted_zone in zones:
             if id and hosted_zone.id != id:
                 continue
 
@@ -18,28 +18,37 @@ CHANNELS = {
     "dev": _channel("Dev")
 }
 
+# (region, channel) -> most recent image
+IMAGE_CACHE = {}
 
-def find_image(region: str, channel: TaupageChannel = None):
-    '''Find the latest Taupage AMI, first try private images, fallback to public'''
+
+def find_image(region: str, channel: TaupageChannel = None, ec2_client=None):
+    '''Find the latest Taupage AMI, first try private images, fallback to public
+
+    Returns the image as described by ``describe_images`` or None. Pass
+    ``ec2_client`` to reuse an existing (thread-safe) low-level EC2 client.'''
 
     if channel is None:
         channel = DEFAULT_CHANNEL
 
-    ec2 = boto3.resource('ec2', region)
+    cache_key = (region, channel)
+    if cache_key in IMAGE_CACHE:
+        return IMAGE_CACHE[cache_key]
+
+    if ec2_client is None:
+        ec2_client = boto3.client('ec2', region)
     filters = [{'Name': 'name', 'Values': [channel.ami_wildcard]},
                {'Name': 'is-public', 'Values': ['false']},
                {'Name': 'state', 'Values': ['available']},
                {'Name': 'root-device-type', 'Values': ['ebs']}]
-    images = list(ec2.images.filter(Filters=filters))
+    images = ec2_client.describe_images(Filters=filters)['Images']
     if not images:
         public_filters = [{'Name': 'name', 'Values': [channel.public_ami_wildcard]},
                           {'Name': 'is-public', 'Values': ['true']},
                           {'Name': 'state', 'Values': ['available']},
                           {'Name': 'root-device-type', 'Values': ['ebs']}]
-        images = list(ec2.images.filter(Filters=public_filters))
-
-    if not images:
-        return None
+        images = ec2_client.describe_images(Filters=public_filters)['Images']
 
-    most_recent_image = sorted(images, key=lambda i: i.name)[-1]
+    most_recent_image = max(images, key=lambda i: i['Name'], default=None)
+    IMAGE_CACHE[cache_key] = most_recent_image
     return most_recent_image
@@ -111,9 +111,11 @@ def check_security_group(sg_name, rules, region, allow_from_self=False):
         return set()
 
 
-def get_mint_bucket_name(region: str):
-    account_id = get_account_id()
-    account_alias = get_account_alias()
+def get_mint_bucket_name(region: str, account_id: str = None, account_alias: str = None):
+    if account_id is None:
+        account_id = get_account_id()
+    if account_alias is None:
+        account_alias = get_account_alias()
     s3 = boto3.resource("s3")
     parts = account_alias.split("-")
     prefix = parts[0]
@@ -64,4 +64,9 @@ def get_load_balancer_name(stack_name: str, stack_version: str):
     """
     # Loadbalancer name cannot exceed 32 characters, try to shorten
     nchars = 32 - len(stack_version) - 1
-    return '{}-{}'.format(generate_valid_cloud_name(stack_name, nchars), stack_version)
+    # only run the (regex based) cleanup if the name doesn't fit or isn't
+    # already a valid cloud name
+    if (len(stack_name) > nchars or '--' in stack_name
+            or stack_name.startswith('-') or stack_name.endswith('-')):
+        stack_name = generate_valid_cloud_name(stack_name, nchars)
+    return '{}-{}'.format(stack_name, stack_version)
@@ -256,6 +256,8 @@ def boto_resource(monkeypatch):
             ec2.vpcs.all.return_value = [MagicMock(vpc_id='vpc-123')]
             ec2.images.filter.return_value = [
                 MagicMock(name='Taupage-AMI-123', id='ami-123')]
+            ec2.meta.client.describe_images.return_value = {
+                'Images': [{'Name': 'Taupage-AMI-123', 'ImageId': 'ami-123'}]}
             ec2.subnets.filter.return_value = [MagicMock(tags=[{'Key': 'Name', 'Value': 'internal-myregion-1a'}],
                                                          id='subnet-abc123',
                                                          availability_zone='myregion-1a'),
@@ -1,5 +1,6 @@
 from botocore.exceptions import ClientError
 from unittest.mock import MagicMock
+import senza.aws
 from senza.aws import (get_security_group, resolve_security_groups,
                        get_account_id, get_account_alias, list_kms_keys,
                        encrypt, get_vpc_attribute, resolve_referenced_resource,
@@ -31,6 +32,7 @@ def test_get_security_group_by_tag_name(monkeypatch):
 
 
 def test_resolve_security_groups(monkeypatch):
+    monkeypatch.setattr('senza.aws.SECURITY_GROUP_ID_CACHE', {})
     ec2 = MagicMock()
     ec2.security_groups.filter = MagicMock(side_effect=[
         [MagicMock(name='app-test', id='sg-test')],
@@ -71,6 +73,37 @@ def test_resolve_security_groups(monkeypatch):
 
     assert result == resolve_security_groups(security_groups, 'myregion')
 
+    # the group name was resolved once and is now cached
+    assert senza.aws.SECURITY_GROUP_ID_CACHE == {('myregion', 'app-test'): 'sg-test'}
+    assert ['sg-test'] == resolve_security_groups(['app-test'], 'myregion')
+    assert ec2.security_groups.filter.call_count == 2
+
+
+def test_resolve_security_groups_prefetch(monkeypatch):
+    monkeypatch.setattr('senza.aws.SECURITY_GROUP_ID_CACHE', {})
+
+    def mock_filter(Filters):
+        if Filters[0]['Name'] == 'tag:Name':
+            assert Filters[0]['Values'] == ['app-a', 'app-b', 'app-c']
+            return [MagicMock(id='sg-a', tags=[{'Key': 'Name', 'Value': 'app-a'}])]
+        else:
+            assert Filters[0]['Values'] == ['app-b', 'app-c']
+            group_b = MagicMock(id='sg-b')
+            group_b.group_name = 'app-b'
+            return [group_b]
+
+    ec2 = MagicMock()
+    ec2.security_groups.filter = MagicMock(side_effect=mock_filter)
+    monkeypatch.setattr('boto3.resource', MagicMock(return_value=ec2))
+    get_security_group = MagicMock(return_value=MagicMock(id='sg-c'))
+    monkeypatch.setattr('senza.aws.get_security_group', get_security_group)
+
+    assert ['sg-a', 'sg-007', 'sg-b', 'sg-c'] == resolve_security_groups(['app-a', 'sg-007', 'app-b', 'app-c'],
+                                                                         'myregion')
+    assert ec2.security_groups.filter.call_count == 2
+    # groups not found in bulk are resolved one by one
+    get_security_group.assert_called_once_with('myregion', 'app-c')
+
 
 def test_create(monkeypatch):
     sns = MagicMock()
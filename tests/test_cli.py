@@ -1613,6 +1613,47 @@ def test_AccountArguments(monkeypatch):
     assert test.TeamID == 'cli'
 
 
+def test_AccountArguments_lists_hosted_zones_once(monkeypatch):
+    boto3 = MagicMock()
+    boto3.list_hosted_zones.return_value = {'HostedZones': [HOSTED_ZONE_EXAMPLE_NET]}
+    monkeypatch.setattr('boto3.client', MagicMock(return_value=boto3))
+
+    test = AccountArguments('test-region')
+
+    assert test.split_domain('app.example.net') == ('app', 'example.net')
+    assert test.split_domain('app-v1.example.net') == ('app-v1', 'example.net')
+    assert test.Domain == 'example.net'
+    boto3.list_hosted_zones.assert_called_once_with()
+
+
+def test_AccountArguments_split_domain_asks_once_per_name(monkeypatch):
+    boto3 = MagicMock()
+    sub_zone = dict(HOSTED_ZONE_EXAMPLE_NET, Name='sub.example.net.')
+    boto3.list_hosted_zones.return_value = {'HostedZones': [HOSTED_ZONE_EXAMPLE_NET,
+                                                            sub_zone]}
+    monkeypatch.setattr('boto3.client', MagicMock(return_value=boto3))
+    choice = MagicMock(return_value='sub.example.net.')
+    monkeypatch.setattr('senza.definitions.choice', choice)
+
+    test = AccountArguments('test-region')
+
+    assert test.split_domain('app.sub.example.net') == ('app', 'sub.example.net')
+    assert test.split_domain('app.sub.example.net') == ('app', 'sub.example.net')
+    assert choice.call_count == 1
+
+
+def test_AccountArguments_caches_default_vpc(monkeypatch):
+    monkeypatch.setattr('senza.definitions.DEFAULT_VPC_CACHE', {})
+    ec2 = MagicMock()
+    ec2.vpcs.all.return_value = [MagicMock(vpc_id='vpc-123', is_default=True, tags=[])]
+    resource = MagicMock(return_value=ec2)
+    monkeypatch.setattr('boto3.resource', resource)
+
+    assert AccountArguments('test-region').VpcID == 'vpc-123'
+    assert AccountArguments('test-region').VpcID == 'vpc-123'
+    resource.assert_called_once_with('ec2', 'test-region')
+
+
 def test_patch(monkeypatch):
     boto3 = MagicMock()
     boto3.list_stacks.return_value = {'StackSummaries': [{'StackName': 'myapp-1',
@@ -1623,8 +1664,7 @@ def test_patch(monkeypatch):
                                                          'StackName': 'myapp-1'}]}
     group = {'AutoScalingGroupName': 'myasg'}
     boto3.describe_auto_scaling_groups.return_value = {'AutoScalingGroups': [group]}
-    image = MagicMock()
-    image.id = 'latesttaupage-123'
+    image = {'Name': 'Taupage-AMI-123', 'ImageId': 'latesttaupage-123'}
 
     props = {}
 
@@ -13,7 +13,8 @@ from senza.components.auto_scaling_group import (component_auto_scaling_group,
                                                  to_iso8601_duration)
 from senza.components.coreos_auto_configuration import component_coreos_auto_configuration
 from senza.components.elastic_load_balancer import (component_elastic_load_balancer,
-                                                    get_load_balancer_name)
+                                                    get_load_balancer_name,
+                                                    get_ssl_cert)
 from senza.components.elastic_load_balancer_v2 import component_elastic_load_balancer_v2
 from senza.components.iam_role import component_iam_role, get_merged_policies
 from senza.components.redis_cluster import component_redis_cluster
@@ -24,9 +25,12 @@ from senza.components.subnet_auto_configuration import component_subnet_auto_con
 from senza.components.taupage_auto_scaling_group import (check_application_id,
                                                          check_application_version,
                                                          check_docker_image_exists,
-                                                         generate_user_data)
+                                                         ensure_docker_image_exists,
+                                                         get_token,
+                                                         generate_user_data,
+                                                         component_taupage_auto_scaling_group)
 from senza.components.weighted_dns_elastic_load_balancer import \
-    component_weighted_dns_elastic_load_balancer
+    component_weighted_dns_elastic_load_balancer, find_subdomain_and_zone
 from senza.components.weighted_dns_elastic_load_balancer_v2 import \
     component_weighted_dns_elastic_load_balancer_v2
 
@@ -52,13 +56,44 @@ def test_component_iam_role(monkeypatch):
     assert [{'a': 'b'}] == result['Resources']['MyRole']['Properties']['Policies']
 
 
-def test_get_merged_policies(monkeypatch):
-    role = MagicMock()
-    role.policies.all = MagicMock(return_value=[MagicMock(policy_name='pol1', policy_document={'foo': 'bar'})])
+def mock_role_policies(policies: dict):
+    """
+    Mocks the IAM resource with the given {role name: {policy name: document}}
+    """
+    def role_policy(policy_name):
+        policy = MagicMock()
+        policy.name = policy_name
+        return policy
+
+    def get_role_policy(RoleName, PolicyName):
+        return {'RoleName': RoleName, 'PolicyName': PolicyName,
+                'PolicyDocument': policies[RoleName][PolicyName]}
+
     iam = MagicMock()
-    iam.Role.return_value = role
+    iam.Role.side_effect = lambda name: MagicMock(**{'policies.all.return_value': [
+        role_policy(policy_name) for policy_name in policies[name]]})
+    iam.meta.client.get_role_policy.side_effect = get_role_policy
+    return iam
+
+
+def test_get_merged_policies(monkeypatch):
+    iam = mock_role_policies({'RoleA': {'pol1': {'foo': 'bar'}}})
     monkeypatch.setattr('boto3.resource', lambda x: iam)
     assert [{'PolicyDocument': {'foo': 'bar'}, 'PolicyName': 'pol1'}] == get_merged_policies(['RoleA'])
+    iam.meta.client.get_role_policy.assert_called_once_with(RoleName='RoleA', PolicyName='pol1')
+
+
+def test_get_merged_policies_multiple_roles(monkeypatch):
+    iam = mock_role_policies({
+        'RoleA': {'pol1': {'a': 1}, 'pol2': {'a': 2}},
+        'RoleB': {},
+        'RoleC': {'pol3': {'c': 3}},
+    })
+    monkeypatch.setattr('boto3.resource', lambda x: iam)
+    assert [{'PolicyDocument': {'a': 1}, 'PolicyName': 'pol1'},
+            {'PolicyDocument': {'a': 2}, 'PolicyName': 'pol2'},
+            {'PolicyDocument': {'c': 3}, 'PolicyName': 'pol3'}] == get_merged_policies(['RoleA', 'RoleB', 'RoleC'])
+    assert [] == get_merged_policies(['RoleB'])
 
 
 def test_component_load_balancer_healthcheck(monkeypatch):
@@ -254,7 +289,73 @@ def test_component_load_balancer_namelength(monkeypatch):
     assert len(lb_name) == 32
 
 
+def test_get_ssl_cert_lookup(monkeypatch):
+    m_acm = MagicMock()
+    m_acm_certificate = MagicMock()
+    m_acm_certificate.arn = "arn:aws:acm:acm-cert"
+    m_acm.return_value.get_certificates.side_effect = lambda **kwargs: iter([m_acm_certificate])
+    monkeypatch.setattr('senza.components.elastic_load_balancer.ACM', m_acm)
+
+    m_iam = MagicMock()
+    m_iam_certificate = MagicMock()
+    m_iam_certificate.arn = "arn:aws:iam::iam-cert"
+    m_iam.return_value.get_certificates.side_effect = lambda **kwargs: iter([m_iam_certificate])
+    monkeypatch.setattr('senza.components.elastic_load_balancer.IAM', m_iam)
+
+    account_info = MagicMock()
+    account_info.Region = 'dummyregion'
+
+    # ACM certificates take priority over IAM ones
+    monkeypatch.setattr('senza.components.elastic_load_balancer.SSL_CERT_CACHE', {})
+    assert get_ssl_cert('foo', 'zo.ne.', None, account_info) == "arn:aws:acm:acm-cert"
+    m_acm.return_value.get_certificates.assert_called_once_with(domain_name='foo.zo.ne')
+    m_iam.return_value.get_certificates.assert_called_once_with(name='zo-ne')
+
+    # the result is cached per region, subdomain and zone
+    assert get_ssl_cert('foo', 'zo.ne.', None, account_info) == "arn:aws:acm:acm-cert"
+    m_acm.return_value.get_certificates.assert_called_once_with(domain_name='foo.zo.ne')
+
+    monkeypatch.setattr('senza.components.elastic_load_balancer.SSL_CERT_CACHE', {})
+    m_acm.return_value.get_certificates.side_effect = lambda **kwargs: iter([])
+    assert get_ssl_cert('foo', 'zo.ne.', None, account_info) == "arn:aws:iam::iam-cert"
+
+    # without a zone only IAM is queried
+    m_acm.reset_mock()
+    assert get_ssl_cert('', '', None, account_info) == "arn:aws:iam::iam-cert"
+    m_acm.return_value.get_certificates.assert_not_called()
+
+    # fall back to any IAM certificate if none matches the zone
+    monkeypatch.setattr('senza.components.elastic_load_balancer.SSL_CERT_CACHE', {})
+    m_iam.return_value.get_certificates.side_effect = \
+        lambda name=None: iter([] if name is not None else [m_iam_certificate])
+    assert get_ssl_cert('foo', 'zo.ne.', None, account_info) == "arn:aws:iam::iam-cert"
+
+
+def test_component_load_balancer_name_suffix(monkeypatch):
+    configuration = {
+        "Name": "test_lb",
+        "SecurityGroups": "",
+        "HTTPPort": "9999",
+        "NameSuffix": "x"
+    }
+    info = {'StackName': 'foobar', 'StackVersion': '0.1'}
+    definition = {"Resources": {}}
+
+    args = MagicMock()
+    args.region = "foo"
+
+    mock_string_result = MagicMock()
+    mock_string_result.return_value = "foo"
+    monkeypatch.setattr('senza.components.elastic_load_balancer.resolve_security_groups', mock_string_result)
+
+    result = component_elastic_load_balancer(definition, configuration, args, info, False, MagicMock())
+    properties = result['Resources']['test_lb']['Properties']
+    assert properties['LoadBalancerName'] == 'foobar-0.1-x'
+    assert 'NameSuffix' not in properties
+
+
 def test_component_stups_auto_configuration(monkeypatch):
+    monkeypatch.setattr('senza.stups.taupage.IMAGE_CACHE', {})
     args = MagicMock()
     args.region = 'myregion'
 
@@ -277,8 +378,7 @@ def test_component_stups_auto_configuration(monkeypatch):
     sn3.availability_zone = 'az-1'
     ec2 = MagicMock()
     ec2.subnets.filter.return_value = [sn1, sn2, sn3]
-    image = MagicMock()
-    ec2.images.filter.return_value = [image]
+    ec2.meta.client.describe_images.return_value = {'Images': [{'Name': 'Taupage-AMI-1', 'ImageId': 'ami-1'}]}
     monkeypatch.setattr('boto3.resource', lambda x, y: ec2)
 
     result = component_stups_auto_configuration({}, configuration, args, MagicMock(), False, MagicMock())
@@ -288,6 +388,7 @@ def test_component_stups_auto_configuration(monkeypatch):
 
 
 def test_component_stups_auto_configuration_vpc_id(monkeypatch):
+    monkeypatch.setattr('senza.stups.taupage.IMAGE_CACHE', {})
     args = MagicMock()
     args.region = 'myregion'
 
@@ -315,8 +416,7 @@ def test_component_stups_auto_configuration_vpc_id(monkeypatch):
         return [sn1, sn2, sn3]
 
     ec2.subnets.filter = get_subnets
-    image = MagicMock()
-    ec2.images.filter.return_value = [image]
+    ec2.meta.client.describe_images.return_value = {'Images': [{'Name': 'Taupage-AMI-1', 'ImageId': 'ami-1'}]}
     monkeypatch.setattr('boto3.resource', lambda x, y: ec2)
 
     result = component_stups_auto_configuration({}, configuration, args, MagicMock(), False, MagicMock())
@@ -325,6 +425,44 @@ def test_component_stups_auto_configuration_vpc_id(monkeypatch):
     assert {'myregion': {'Subnets': ['sn-3']}} == result['Mappings']['ServerSubnets']
 
 
+def test_component_subnet_auto_configuration_mixed_case_names(monkeypatch):
+    args = MagicMock()
+    args.region = 'myregion'
+
+    sn1 = MagicMock(id='sn-1', tags=[{'Key': 'Name', 'Value': 'DMZ-1'}], availability_zone='az-1')
+    sn2 = MagicMock(id='sn-2', tags=[{'Key': 'Name', 'Value': 'Internal-2'}], availability_zone='az-1')
+    sn3 = MagicMock(id='sn-3', tags=[{'Key': 'Name', 'Value': 'NAT-3'}], availability_zone='az-1')
+    ec2 = MagicMock()
+    ec2.subnets.filter.return_value = [sn1, sn2, sn3]
+    monkeypatch.setattr('boto3.resource', lambda x, y: ec2)
+
+    result = component_subnet_auto_configuration({}, {'Name': 'Config'}, args, MagicMock(), False, MagicMock())
+
+    assert {'myregion': {'Subnets': ['sn-1']}} == result['Mappings']['LoadBalancerSubnets']
+    assert {'myregion': {'Subnets': ['sn-2']}} == result['Mappings']['LoadBalancerInternalSubnets']
+    assert {'myregion': {'Subnets': ['sn-2']}} == result['Mappings']['ServerSubnets']
+
+
+def test_component_stups_auto_configuration_caches_images(monkeypatch):
+    monkeypatch.setattr('senza.stups.taupage.IMAGE_CACHE', {})
+    args = MagicMock()
+    args.region = 'myregion'
+
+    ec2 = MagicMock()
+    ec2.subnets.filter.return_value = []
+    ec2.meta.client.describe_images.return_value = {'Images': [{'Name': 'Taupage-AMI-1', 'ImageId': 'ami-1'},
+                                                               {'Name': 'Taupage-AMI-2', 'ImageId': 'ami-123'}]}
+    monkeypatch.setattr('boto3.resource', lambda x, y: ec2)
+
+    for _ in range(2):
+        result = component_stups_auto_configuration({}, {'Name': 'Config'}, args, MagicMock(), False, MagicMock())
+        assert {'myregion': {'LatestTaupageImage': 'ami-123',
+                             'LatestTaupageStagingImage': 'ami-123',
+                             'LatestTaupageDevImage': 'ami-123'}} == result['Mappings']['Images']
+    # one lookup per channel
+    assert ec2.meta.client.describe_images.call_count == 3
+
+
 def test_component_redis_node(monkeypatch):
     mock_string = "foo"
 
@@ -391,6 +529,18 @@ def test_component_redis_cluster(monkeypatch):
     assert 'SubnetIds' in result['Resources']['RedisSubnetGroup']['Properties']
 
 
+def test_find_subdomain_and_zone(monkeypatch):
+    route53 = MagicMock()
+    route53.list_hosted_zones.return_value = {'HostedZones': [HOSTED_ZONE_ZO_NE_DEV, HOSTED_ZONE_ZO_NE_COM]}
+    monkeypatch.setattr('boto3.client', MagicMock(return_value=route53))
+    account_info = AccountArguments('dummyregion')
+
+    assert find_subdomain_and_zone(account_info, 'great.api.zo.ne.com') == ('great.api', 'zo.ne.com.')
+    assert find_subdomain_and_zone(account_info, 'version.api.zo.ne.dev') == ('version.api', 'zo.ne.dev.')
+    # the hosted zones are only listed once
+    route53.list_hosted_zones.assert_called_once_with()
+
+
 def test_weighted_dns_load_balancer(monkeypatch, boto_client, boto_resource):  # noqa: F811
     senza.traffic.DNS_ZONE_CACHE = {}
 
@@ -535,6 +685,49 @@ def test_component_taupage_auto_scaling_group_user_data_with_lists_and_empty_dic
     assert expected_user_data == generate_user_data(configuration, 'region')
 
 
+def test_component_taupage_auto_scaling_group_nat_gateways(monkeypatch):
+    ec2 = MagicMock()
+    ec2.get_paginator.return_value.paginate.return_value = [
+        {'NatGateways': [{'SubnetId': 'sn-1',
+                          'NatGatewayAddresses': [{'PrivateIp': '10.0.0.1'}, {'PrivateIp': '10.0.0.2'}]}]},
+        {'NatGateways': [{'SubnetId': 'sn-2', 'NatGatewayAddresses': [{'PrivateIp': '10.0.1.1'}]},
+                         {'SubnetId': 'sn-3', 'NatGatewayAddresses': []}]}]
+    monkeypatch.setattr('boto3.client', MagicMock(return_value=ec2))
+
+    subnets = {'myregion': {'Subnets': ['sn-2', 'sn-1']}}
+    definition = {'Resources': {},
+                  'Mappings': {'ServerSubnets': subnets, 'LoadBalancerInternalSubnets': subnets}}
+    configuration = {'Name': 'Foo', 'InstanceType': 't2.micro', 'Image': 'foo',
+                     'TaupageConfig': {'runtime': 'Docker', 'source': 'registry/foo/bar:1.0'}}
+    args = MagicMock()
+    args.region = 'myregion'
+    info = {'StackName': 'foo', 'StackVersion': '1'}
+
+    result = component_taupage_auto_scaling_group(definition, configuration, args, info, True, MagicMock())
+
+    ec2.get_paginator.assert_called_once_with('describe_nat_gateways')
+    ec2.get_paginator.return_value.paginate.assert_called_once_with(
+        Filter=[{'Name': 'subnet-id', 'Values': ['sn-1', 'sn-2']}])
+    assert configuration['TaupageConfig']['nat_gateways'] == {'sn-1': '10.0.0.1', 'sn-2': '10.0.1.1'}
+    user_data = result['Resources']['FooConfig']['Properties']['UserData']['Fn::Base64']
+    assert 'nat_gateways:\n  sn-1: 10.0.0.1\n  sn-2: 10.0.1.1\n' in user_data
+
+
+def test_component_taupage_auto_scaling_group_user_data_with_placeholder_text():
+    configuration = {
+        'environment': {
+            'ENV1': "{{ 0 }}",
+            'ENV2': "{{ 5 }}",
+            'ENV3': {"Ref": "REF1"}
+        }
+    }
+
+    expected_user_data = {'Fn::Join': ['', [
+        "#taupage-ami-config\nenvironment:\n  ENV1: '{{ 0 }}'\n  ENV2: '{{ 5 }}'\n  ENV3: ", {'Ref': 'REF1'}, '\n']]}
+
+    assert expected_user_data == generate_user_data(configuration, 'region')
+
+
 def test_component_auto_scaling_group_configurable_properties():
     definition = {"Resources": {}}
     configuration = {
@@ -907,6 +1100,35 @@ def test_check_docker_image_exists():
         assert not output_function.called
 
 
+def test_ensure_docker_image_exists(monkeypatch):
+    monkeypatch.setattr('senza.components.taupage_auto_scaling_group.CHECKED_DOCKER_IMAGES', set())
+    mock_check = MagicMock(return_value=True)
+    monkeypatch.setattr('senza.components.taupage_auto_scaling_group.check_docker_image_exists', mock_check)
+    source = 'registry/bar/foobar:1.0'
+    image = pierone.api.DockerImage(registry='registry', team='bar', artifact='foobar', tag='1.0')
+
+    # forced runs and images without registry are not checked
+    ensure_docker_image_exists(source, image, True)
+    ensure_docker_image_exists('bar/foobar:1.0', image._replace(registry=''), False)
+    assert not mock_check.called
+
+    # each source is only checked once
+    ensure_docker_image_exists(source, image, False)
+    ensure_docker_image_exists(source, image, False)
+    mock_check.assert_called_once_with(image)
+
+
+def test_get_token_is_cached(monkeypatch):
+    monkeypatch.setattr('senza.components.taupage_auto_scaling_group.PIERONE_TOKEN_CACHE', {})
+    get_existing_token = MagicMock(return_value={'access_token': 'abc'})
+    monkeypatch.setattr('zign.api.get_existing_token', get_existing_token)
+    docker_image = pierone.api.DockerImage(registry='pierone', team='bar', artifact='foobar', tag='1.0')
+
+    assert get_token(docker_image) == {'access_token': 'abc'}
+    assert get_token(docker_image._replace(tag='2.0')) == {'access_token': 'abc'}
+    get_existing_token.assert_called_once_with('pierone')
+
+
 def test_check_application_id():
     check_application_id('test-app')
 
@@ -918,6 +1140,13 @@ def test_check_application_id():
     with pytest.raises(click.UsageError):
         check_application_id('test-APP')
 
+    with pytest.raises(click.UsageError):
+        check_application_id('test-app\n')
+
+    with pytest.raises(click.UsageError) as error:
+        check_application_id('42yolo')
+    assert '"^[a-z][a-z0-9-]*[a-z0-9]$"' in error.value.message
+
 
 def test_check_application_version():
     check_application_version('1.0')
@@ -930,6 +1159,10 @@ def test_check_application_version():
     with pytest.raises(click.UsageError):
         check_application_id('1.')
 
+    with pytest.raises(click.UsageError) as error:
+        check_application_version('1.')
+    assert '"^[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?$"' in error.value.message
+
 
 def test_get_load_balancer_name():
     get_load_balancer_name('a', '1') == 'a-1'
@@ -1262,3 +1495,103 @@ def test_component_autoscaling_group_multiple_load_balancer_v2(monkeypatch):
     result = component_auto_scaling_group(definition, configuration, args, info, False, MagicMock())
 
     assert [{'Ref': 'LB1TargetGroup'},{'Ref': 'LB2TargetGroup'}] == result['Resources']['Test']['Properties']['TargetGroupARNs']
+
+
+def test_component_load_balancer_v2_listeners_and_overrides(monkeypatch):
+    configuration = {
+        "Name": "test_lb",
+        "SecurityGroups": "",
+        "HTTPPort": "9999",
+        "HealthCheckIntervalSeconds": "30",
+        "Listeners": [{"Properties": {"Port": 443}}, {"Properties": {"Port": 8443}}]
+    }
+    info = {'StackName': 'foobar', 'StackVersion': '0.1'}
+    definition = {"Resources": {}}
+
+    args = MagicMock()
+    args.region = "foo"
+
+    mock_string_result = MagicMock()
+    mock_string_result.return_value = "foo"
+    monkeypatch.setattr('senza.components.elastic_load_balancer_v2.resolve_security_groups', mock_string_result)
+
+    result = component_elastic_load_balancer_v2(definition, configuration, args, info, False, MagicMock())
+    resources = result["Resources"]
+    assert 443 == resources["test_lbListener"]["Properties"]["Port"]
+    assert 8443 == resources["test_lbListener2"]["Properties"]["Port"]
+    assert "test_lbListener1" not in resources
+    # only properties we already defined are overwritten
+    assert "30" == resources["test_lbTargetGroup"]["Properties"]["HealthCheckIntervalSeconds"]
+    assert "HealthCheckIntervalSeconds" not in resources["test_lb"]["Properties"]
+    assert "9999" == resources["test_lbTargetGroup"]["Properties"]["Port"]
+
+
+def test_component_load_balancer_v2_name_suffix(monkeypatch):
+    configuration = {
+        "Name": "test_lb",
+        "SecurityGroups": "",
+        "HTTPPort": "9999",
+        "NameSuffix": "x"
+    }
+    info = {'StackName': 'foobar', 'StackVersion': '0.1'}
+    definition = {"Resources": {}}
+
+    args = MagicMock()
+    args.region = "foo"
+
+    mock_string_result = MagicMock()
+    mock_string_result.return_value = "foo"
+    monkeypatch.setattr('senza.components.elastic_load_balancer_v2.resolve_security_groups', mock_string_result)
+
+    result = component_elastic_load_balancer_v2(definition, configuration, args, info, False, MagicMock())
+    assert 'foobar-0.1-x' == result["Resources"]["test_lb"]["Properties"]["Name"]
+    assert 'foobar-0.1-x' == result["Resources"]["test_lbTargetGroup"]["Properties"]["Name"]
+    tags = [{'Key': 'Name', 'Value': 'foobar-0.1'},
+            {'Key': 'StackName', 'Value': 'foobar'},
+            {'Key': 'StackVersion', 'Value': '0.1'}]
+    assert tags == result["Resources"]["test_lb"]["Properties"]["Tags"]
+    assert tags == result["Resources"]["test_lbTargetGroup"]["Properties"]["Tags"]
+
+
+def test_component_load_balancer_v2_converts_domains_once(monkeypatch):
+    configuration = {
+        "Name": "test_lb",
+        "SecurityGroups": "",
+        "HTTPPort": "9999",
+        "SSLCertificateId": "arn:aws:iam::0000:server-certificate/cert",
+        "Domains": {"MainDomain": {"Type": "standalone", "Zone": "zo.ne", "Subdomain": "app"}}
+    }
+    info = {'StackName': 'foobar', 'StackVersion': '0.1'}
+
+    args = MagicMock()
+    args.region = "foo"
+
+    mock_string_result = MagicMock()
+    mock_string_result.return_value = "foo"
+    monkeypatch.setattr('senza.components.elastic_load_balancer_v2.resolve_security_groups', mock_string_result)
+    convert = MagicMock()
+    monkeypatch.setattr('senza.components.elastic_load_balancer.convert_cname_records_to_alias', convert)
+    monkeypatch.setattr('senza.components.elastic_load_balancer.CONVERTED_DOMAINS', set())
+
+    for _ in range(2):
+        result = component_elastic_load_balancer_v2({"Resources": {}}, dict(configuration), args, info, False,
+                                                    MagicMock())
+        assert 'app.zo.ne' == result["Resources"]["test_lbMainDomain"]["Properties"]["Name"]
+    convert.assert_called_once_with('app.zo.ne')
+
+
+def test_component_load_balancer_v2_invalid_health_check_protocol(monkeypatch):
+    configuration = {
+        "Name": "test_lb",
+        "SecurityGroups": "",
+        "HTTPPort": "9999",
+        "HealthCheckProtocol": "TCP",
+    }
+    info = {'StackName': 'foobar', 'StackVersion': '0.1'}
+
+    get_ssl_cert = MagicMock()
+    monkeypatch.setattr('senza.components.elastic_load_balancer_v2.get_ssl_cert', get_ssl_cert)
+
+    with pytest.raises(click.UsageError):
+        component_elastic_load_balancer_v2({"Resources": {}}, configuration, MagicMock(), info, False, MagicMock())
+    get_ssl_cert.assert_not_called()
@@ -1,6 +1,10 @@
+import os
+from pathlib import Path
+
 from mock import MagicMock, mock_open
 
 import pytest
+import yaml
 import senza.configuration
 from senza.exceptions import InvalidConfigKey
 
@@ -9,6 +13,7 @@ class MockConfig:
 
     def __init__(self):
         self.open = mock_open(read_data='{"section": {"key": "value"}}')
+        self.stat = MagicMock(return_value=MagicMock(st_mtime_ns=1))
 
     @property
     def parent(self):
@@ -25,6 +30,19 @@ def test_dict():
     assert next(iter(config)) == 'section'
 
 
+def test_dict_is_cached():
+    mock = MockConfig()
+    config = senza.configuration.Configuration(mock)
+    assert config['section.key'] == 'value'
+    assert list(config) == ['section']
+    assert mock.open.call_count == 1
+
+    # the file is read again once it changes
+    mock.stat.return_value = MagicMock(st_mtime_ns=2)
+    assert config['section.key'] == 'value'
+    assert mock.open.call_count == 2
+
+
 def test_dict_file_not_found():
     m_config = MockConfig()
     m_config.open.side_effect = FileNotFoundError
@@ -38,27 +56,101 @@ def test_get():
     assert config['section.key'] == 'value'
 
 
+def test_contains():
+    config = senza.configuration.Configuration(MockConfig())
+    assert 'section.key' in config
+    assert 'section.other_key' not in config
+    assert 'section2.key' not in config
+
+
 def test_get_bad_key():
     config = senza.configuration.Configuration(MockConfig())
     with pytest.raises(InvalidConfigKey):
         config['key']
 
 
-def test_set():
-    mock = MockConfig()
-    config = senza.configuration.Configuration(mock)
+@pytest.fixture()
+def config_path(tmpdir) -> Path:
+    path = Path(str(tmpdir.join('config.yaml')))
+    path.write_text('section:\n  key: value\n')
+    return path
+
+
+def test_set(config_path):
+    config = senza.configuration.Configuration(config_path)
     config['section.new_key'] = 'other_value'
-    mock.open.assert_called_with('w+')
+    assert yaml.safe_load(config_path.read_text()) == {'section': {'key': 'value',
+                                                                   'new_key': 'other_value'}}
 
     # new sections don't raise errors
     config['section2.new_key'] = 'other_value'
+    assert yaml.safe_load(config_path.read_text())['section2'] == {'new_key': 'other_value'}
+    # no temporary files are left behind
+    assert os.listdir(str(config_path.parent)) == ['config.yaml']
+
+
+def test_set_new_file(tmpdir):
+    config_path = Path(str(tmpdir.join('senza', 'config.yaml')))
+    config = senza.configuration.Configuration(config_path)
+    config['section.key'] = 'value'
+    assert yaml.safe_load(config_path.read_text()) == {'section': {'key': 'value'}}
 
 
-def test_del():
+def test_set_keeps_mode(config_path):
+    config_path.chmod(0o640)
+    config = senza.configuration.Configuration(config_path)
+    config['section.new_key'] = 'other_value'
+    assert config_path.stat().st_mode & 0o777 == 0o640
+
+
+def test_set_keeps_symlink(config_path, tmpdir):
+    link = Path(str(tmpdir.join('link.yaml')))
+    link.symlink_to(config_path)
+    config = senza.configuration.Configuration(link)
+    config['section.new_key'] = 'other_value'
+    assert link.is_symlink()
+    assert yaml.safe_load(config_path.read_text())['section']['new_key'] == 'other_value'
+
+
+def test_set_failed_dump_removes_tmp(config_path, monkeypatch):
+    monkeypatch.setattr('yaml.dump', MagicMock(side_effect=yaml.YAMLError))
+    config = senza.configuration.Configuration(config_path)
+    with pytest.raises(yaml.YAMLError):
+        config['section.new_key'] = 'other_value'
+    assert os.listdir(str(config_path.parent)) == ['config.yaml']
+    assert config_path.read_text() == 'section:\n  key: value\n'
+    assert 'section.new_key' not in config
+
+
+def test_set_updates_cache(config_path, monkeypatch):
+    config = senza.configuration.Configuration(config_path)
+    config['section.new_key'] = 'other_value'
+
+    # the written configuration is not parsed again
+    load = MagicMock()
+    monkeypatch.setattr('yaml.load', load)
+    assert config['section.new_key'] == 'other_value'
+    assert config['section.key'] == 'value'
+    assert not load.called
+
+
+def test_set_failed_save_drops_cache():
     mock = MockConfig()
+    mock.mkdir = MagicMock(side_effect=PermissionError)
     config = senza.configuration.Configuration(mock)
+    with pytest.raises(PermissionError):
+        config['section.new_key'] = 'other_value'
+
+    # the unsaved value is not returned, the file is parsed again instead
+    with pytest.raises(KeyError):
+        config['section.new_key']
+    assert mock.open.call_count == 2
+
+
+def test_del(config_path):
+    config = senza.configuration.Configuration(config_path)
     del config['section.key']
-    mock.open.assert_called_with('w+')
+    assert yaml.safe_load(config_path.read_text()) == {'section': {}}
 
     with pytest.raises(KeyError):
         del config['section2.new_key']
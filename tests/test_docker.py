@@ -6,8 +6,9 @@ from senza.docker import docker_image_exists
 
 
 def test_docker_image_exists(monkeypatch):
+    monkeypatch.setattr('senza.docker.REGISTRY_SCHEMES', {})
     get = MagicMock()
-    monkeypatch.setattr('requests.get', get)
+    monkeypatch.setattr('senza.docker.DOCKER_REGISTRY_SESSION.get', get)
 
     get.return_value = MagicMock(name='response')
     get.return_value.json = lambda: {'tags': ['1.0']}
@@ -18,3 +19,36 @@ def test_docker_image_exists(monkeypatch):
 
     get.side_effect = requests.HTTPError()
     assert docker_image_exists('my-registry/foo/bar:1.0') is False
+
+
+def test_docker_image_exists_remembers_scheme(monkeypatch):
+    monkeypatch.setattr('senza.docker.REGISTRY_SCHEMES', {})
+    response = MagicMock(name='response')
+    response.json = lambda: {'tags': ['1.0']}
+
+    def get(url, timeout):
+        if url.startswith('https://'):
+            raise requests.ConnectionError()
+        return response
+
+    get = MagicMock(side_effect=get)
+    monkeypatch.setattr('senza.docker.DOCKER_REGISTRY_SESSION.get', get)
+
+    assert docker_image_exists('my-registry/foo/bar:1.0') is True
+    assert get.call_count == 2
+
+    # the registry is only reachable with http, so that is tried first now
+    assert docker_image_exists('my-registry/foo/baz:1.0') is True
+    assert get.call_count == 3
+    get.assert_called_with('http://my-registry/v2/foo/baz/tags/list', timeout=5)
+
+
+def test_docker_image_exists_registry_with_port(monkeypatch):
+    get = MagicMock()
+    get.return_value.json.return_value = {'tags': ['1.0']}
+    monkeypatch.setattr('senza.docker.DOCKER_REGISTRY_SESSION.get', get)
+    monkeypatch.setattr('senza.docker.REGISTRY_SCHEMES', {})
+
+    assert docker_image_exists('my-registry:5000/foo/bar:1.0') is True
+    get.assert_called_once_with('https://my-registry:5000/v2/foo/bar/tags/list',
+                                timeout=5)
@@ -12,7 +12,8 @@ from senza.components.elastigroup import (component_elastigroup, ELASTIGROUP_DEF
                                           ensure_default_product, fill_standard_tags, extract_subnets,
                                           extract_load_balancer_name, extract_public_ips,
                                           extract_image_id, extract_security_group_ids, extract_instance_types,
-                                          extract_instance_profile)
+                                          extract_instance_profile, extract_spotinst_account_id,
+                                          extract_user_data)
 
 
 def test_component_elastigroup_defaults(monkeypatch):
@@ -98,6 +99,22 @@ def test_raw_user_data_and_base64_encoding_cf_function_used(monkeypatch):
     assert "some/fake/artifact:test" in launch_specification["userData"]["Fn::Base64"]
 
 
+def test_docker_image_is_checked_once(monkeypatch):
+    monkeypatch.setattr('senza.components.taupage_auto_scaling_group.CHECKED_DOCKER_IMAGES', set())
+    mock_check = MagicMock(return_value=True)
+    monkeypatch.setattr('senza.components.taupage_auto_scaling_group.check_docker_image_exists', mock_check)
+    monkeypatch.setattr('senza.components.elastigroup.generate_user_data', MagicMock(return_value="#taupage"))
+    info = {'StackName': 'foobar', 'StackVersion': '0.1'}
+
+    for name in ("eg1", "eg2"):
+        configuration = {"Name": name,
+                         "TaupageConfig": {"runtime": "Docker", "source": "registry/team/artifact:1.0"}}
+        got = {}
+        extract_user_data(configuration, got, info, False, MagicMock())
+        assert got["compute"]["launchSpecification"]["userData"] == {"Fn::Base64": "#taupage"}
+    mock_check.assert_called_once()
+
+
 def test_missing_access_token():
     with pytest.raises(click.UsageError):
         component_elastigroup({}, {}, MagicMock(), MagicMock(), False, MagicMock())
@@ -128,6 +145,32 @@ def test_spotinst_account_resolution_failure():
             resolve_account_id("fake-token", "12345")
 
 
+def test_spotinst_account_resolution_retries_on_server_errors():
+    with responses.RequestsMock() as rsps:
+        url = '{}/setup/account?awsAccountId=12345'.format(SPOTINST_API_URL)
+        rsps.add(rsps.GET, url, status=503)
+        rsps.add(rsps.GET, url, status=200, json={"response": {"items": [{"accountId": "act-1234abcd"}]}})
+
+        assert resolve_account_id("fake-token", "12345") == "act-1234abcd"
+        assert len(rsps.calls) == 2
+
+
+def test_spotinst_account_id_is_cached(monkeypatch):
+    monkeypatch.setattr('senza.components.elastigroup.SPOTINST_ACCOUNT_ID_CACHE', {})
+    mock_resolve_account_id = MagicMock(return_value='act-12345abcdef')
+    monkeypatch.setattr('senza.components.elastigroup.resolve_account_id', mock_resolve_account_id)
+    definition = {"Mappings": {"Senza": {"Info": {}}}}
+    account_info = MagicMock(AccountID="12345")
+
+    for _ in range(2):
+        assert extract_spotinst_account_id("fake-token", definition, account_info) == 'act-12345abcdef'
+    mock_resolve_account_id.assert_called_once_with("fake-token", "12345")
+
+    # the template defined account id always takes precedence
+    definition["Mappings"]["Senza"]["Info"]["SpotinstAccountId"] = "act-template"
+    assert extract_spotinst_account_id("fake-token", definition, account_info) == 'act-template'
+
+
 def test_block_mappings():
     test_cases = [
         {  # leave elastigroup settings untouched
@@ -392,6 +435,34 @@ def test_standard_tags():
                 "name": "foo-bar",
             },
         },
+        {  # standard tags are appended after the custom tags, which are kept as they are
+            "definition": {"Mappings": {"Senza": {"Info": {"StackName": "foo", "StackVersion": "bar"}}}},
+            "given_config": {
+                "compute": {
+                    "launchSpecification": {
+                        "tags": [
+                            {"tagKey": "StackVersion", "tagValue": "some-stack-version"},
+                            {"tagKey": "some-key", "tagValue": "some-value"},
+                            {"tagKey": "no-value", "extra": "kept"},
+                        ]
+                    }
+                }
+            },
+            "expected_config": {
+                "compute": {
+                    "launchSpecification": {
+                        "tags": [
+                            {"tagKey": "some-key", "tagValue": "some-value"},
+                            {"tagKey": "no-value", "extra": "kept"},
+                            {"tagKey": "Name", "tagValue": "foo-bar"},
+                            {"tagKey": "StackName", "tagValue": "foo"},
+                            {"tagKey": "StackVersion", "tagValue": "bar"},
+                        ]
+                    },
+                },
+                "name": "foo-bar",
+            },
+        },
         {  # leave name untouched
             "definition": {"Mappings": {"Senza": {"Info": {"StackName": "foo", "StackVersion": "bar"}}}},
             "given_config": {"name": "must-stay-untouched"},
@@ -709,6 +780,11 @@ def test_extract_security_group_ids(monkeypatch):
             "given_config": {},
             "expected_sgs": ["foo", "bar"],
         },
+        {  # duplicate security groups are only resolved once
+            "input": {"SecurityGroups": ["foo", "bar", "foo"]},
+            "given_config": {},
+            "expected_sgs": ["foo", "bar"],
+        },
         {  # leave securityGroupsIds untouched
             "input": {"SecurityGroups": ["foo", "bar"]},
             "given_config": {"compute": {"launchSpecification": {"securityGroupIds": "fake-sg"}}},
@@ -726,6 +802,7 @@ def test_extract_security_group_ids(monkeypatch):
                 return sg
 
             m.setattr('senza.aws.resolve_security_group', mock_resolve_security_group)
+            m.setattr('senza.aws.prefetch_security_groups', MagicMock())
 
             got = test_case["given_config"]
             extract_security_group_ids(test_case["input"], got, mock_args)
@@ -1,4 +1,5 @@
 import inspect
+import os
 import random
 import string
 from unittest.mock import MagicMock
@@ -25,13 +26,15 @@ def generate_fake_filename() -> str:
 
 
 @fixture()
-def mock_tempfile(monkeypatch):
-    random_name = generate_fake_filename()
-    mock = MagicMock(name=random_name)
+def mock_tempfile(monkeypatch, tmpdir):
+    file_name = str(tmpdir.join(generate_fake_filename()))
 
-    mock.__enter__.return_value = mock
-    mock.return_value = mock
-    monkeypatch.setattr('senza.error_handling.NamedTemporaryFile', mock)
+    def mkstemp(prefix):
+        return os.open(file_name, os.O_WRONLY | os.O_CREAT), file_name
+
+    mock = MagicMock(side_effect=mkstemp)
+    mock.name = file_name
+    monkeypatch.setattr('senza.error_handling.mkstemp', mock)
     return mock
 
 
@@ -39,10 +42,15 @@ def mock_tempfile(monkeypatch):
 def mock_raven(monkeypatch):
     mock = MagicMock()
     mock.return_value = mock
-    monkeypatch.setattr('senza.error_handling.Client', mock)
+    monkeypatch.setattr('raven.Client', mock)
     return mock
 
 
+def test_raven_is_imported_lazily():
+    senza.error_handling.setup_sentry(None)
+    assert 'Client' not in vars(senza.error_handling)
+
+
 def test_store_exception(monkeypatch, mock_tempfile):
 
     line_n = lineno() + 2
@@ -58,10 +66,28 @@ def test_store_exception(monkeypatch, mock_tempfile):
 
     expected_exception = '\n'.join(lines).encode()
 
-    mock_tempfile.assert_called_once_with(prefix='senza-traceback-',
-                                          delete=False)
+    mock_tempfile.assert_called_once_with(prefix='senza-traceback-')
     assert file_name == mock_tempfile.name
-    mock_tempfile.write.assert_called_once_with(expected_exception)
+    with open(file_name, 'rb') as error_file:
+        written = error_file.read()
+    assert written == expected_exception
+
+
+def test_store_exception_partial_writes(monkeypatch, mock_tempfile):
+    real_write = os.write
+    # write at most 10 bytes per call
+    write = MagicMock(side_effect=lambda fd, data: real_write(fd, data[:10]))
+    monkeypatch.setattr('senza.error_handling.os.write', write)
+
+    try:
+        raise Exception("Testing exception handing")
+    except Exception as e:
+        file_name = senza.error_handling.store_exception(e)
+
+    with open(file_name, 'rb') as error_file:
+        written = error_file.read()
+    assert written.endswith(b'Exception: Testing exception handing\n')
+    assert write.call_count == (len(written) + 9) // 10
 
 
 def test_store_nested_exception(monkeypatch, mock_tempfile):
@@ -90,10 +116,11 @@ def test_store_nested_exception(monkeypatch, mock_tempfile):
 
     expected_exception = '\n'.join(lines).encode()
 
-    mock_tempfile.assert_called_once_with(prefix='senza-traceback-',
-                                          delete=False)
+    mock_tempfile.assert_called_once_with(prefix='senza-traceback-')
     assert file_name == mock_tempfile.name
-    mock_tempfile.write.assert_called_once_with(expected_exception)
+    with open(file_name, 'rb') as error_file:
+        written = error_file.read()
+    assert written == expected_exception
 
 
 def test_missing_credentials(capsys):
@@ -136,6 +163,20 @@ def test_expired_credentials(capsys):
     assert 'AWS credentials have expired.' in err
 
 
+def test_request_expired(capsys):
+    func = MagicMock(side_effect=botocore.exceptions.ClientError(
+        {'Error': {'Code': 'RequestExpired',
+                   'Message': 'Request has expired'}},
+        'foobar'))
+
+    with raises(SystemExit):
+        senza.error_handling.HandleExceptions(func)()
+
+    out, err = capsys.readouterr()
+
+    assert 'AWS credentials have expired.' in err
+
+
 def test_unknown_ClientError_raven(capsys, mock_raven):
     senza.error_handling.sentry = senza.error_handling.setup_sentry('test')
     func = MagicMock(side_effect=botocore.exceptions.ClientError(
@@ -246,8 +287,7 @@ def test_unknown_error(capsys, mock_tempfile, mock_raven):
 
     out, err = capsys.readouterr()
 
-    mock_tempfile.assert_called_once_with(prefix='senza-traceback-',
-                                          delete=False)
+    mock_tempfile.assert_called_once_with(prefix='senza-traceback-')
 
     assert 'Unknown Error: something.' in err
 
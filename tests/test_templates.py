@@ -33,6 +33,21 @@ def test_template_helper_get_mint_bucket_name(monkeypatch):
     assert 'myorg-stups-mint-123-myregion' == get_mint_bucket_name('otherregion'), 'Find Mint bucket in other Region'
 
 
+def test_template_helper_get_mint_bucket_name_known_account(monkeypatch):
+    get_account_id = MagicMock()
+    get_account_alias = MagicMock()
+    monkeypatch.setattr('senza.templates._helper.get_account_id', get_account_id)
+    monkeypatch.setattr('senza.templates._helper.get_account_alias', get_account_alias)
+    s3 = MagicMock()
+    s3.return_value.Bucket.return_value.load.side_effect = Exception()
+    s3.return_value.buckets.all.return_value = []
+    monkeypatch.setattr('boto3.resource', s3)
+
+    assert 'myorg-stups-mint-123-myregion' == get_mint_bucket_name('myregion', 123, 'myorg-foobar')
+    get_account_id.assert_not_called()
+    get_account_alias.assert_not_called()
+
+
 def test_template_helper_get_iam_role_policy(monkeypatch):
     expected_policy = {
         "Version": "2012-10-17",
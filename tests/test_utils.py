@@ -11,6 +11,9 @@ def test_get_load_balancer_name():
     assert get_load_balancer_name(stack_name='really-long-application-name',
                                   stack_version='cd871c54') == 'really-long-application-cd871c54'
     assert get_load_balancer_name(stack_name='app-name', stack_version='1') == 'app-name-1'
+    assert get_load_balancer_name(stack_name='app--name-', stack_version='1') == 'app-name-1'
+    assert get_load_balancer_name(stack_name='really-long-application-', stack_version='cd871c54') == \
+        'really-long-application-cd871c54'
 
 
 def test_generate_valid_cloud_name():